@@ -1,3 +1,9 @@
+"""
+Convert legacy `[12.88s] text` transcripts into structured JSON.
+
+src.transcriber now writes data/structured_transcripts/ directly (with end times
+and word timings), so this is only needed for .txt transcripts made before that.
+"""
 import os
 import json
 import re
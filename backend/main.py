@@ -1,7 +1,18 @@
-from fastapi import FastAPI, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import os
+import time
 import openai
-from src.search import get_full_transcript, find_best_video_segment, load_config
+from src.cache import AnswerCache, SemanticCache, SEMANTIC_CACHE_ENABLED
+from src.corpus import corpus
+from src.embeddings import create_embedding_provider, embed_query
+from src.index import get_vector_index, start_index_maintainer
+from src.positional import get_positional_index
+from src.search import find_best_video_segment, load_config, retrieve_context, get_lexical_index, get_episode, refine_timestamp, count_tokens, format_segment_context, resolve_segment_timestamp, parse_timecode, segment_at_time, segment_at_offset, TIMESTAMP_MODE, TIMESTAMP_REFINE, HYBRID_RETRIEVAL
 
 # Load API Key
 config = load_config()
@@ -10,11 +21,32 @@ api_key = config.get("openai_api_key", None)
 if not api_key or not api_key.startswith("sk-"):
     raise ValueError("❌ ERROR: OpenAI API key is missing or incorrect. Check config.yaml!")
 
-# External video URL (Dropbox, S3, etc.)
-EXTERNAL_VIDEO_URL = "https://www.dropbox.com/scl/fi/yz7xlp3qo3h95p4r0xtjv/march_11.mp4?rlkey=u9frr2ar77ohfhnenvkqleo0j&st=ldp6pqqo&dl=1"
+@asynccontextmanager
+async def lifespan(app):
+    # Load the episode registry and parse every transcript once up front;
+    # the watcher picks up new episodes and edits in the background
+    corpus.refresh()
+    corpus.start_watcher()
+    get_lexical_index()  # Build the retrieval index before the first query
+    get_positional_index()  # ...and the exact phrase index
+    count_tokens("")  # Load the tiktoken encoding up front
+    print(f"📚 Corpus cache ready ({len(corpus.entries)} episode(s)).")
+
+    # One OpenAI client (and connection pool) shared by every request
+    app.state.openai_client = openai.AsyncOpenAI(api_key=api_key)
+    app.state.answer_cache = AnswerCache()
+    app.state.semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
+    app.state.embedder = create_embedding_provider(
+        client=openai.OpenAI(api_key=api_key), async_client=app.state.openai_client
+    )
+
+    # Embed newly ingested episodes into the vector index in the background
+    start_index_maintainer(app.state.embedder, corpus)
+    yield
+    await app.state.openai_client.close()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend to connect to backend
 app.add_middleware(
@@ -25,43 +57,258 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/")
-def home():
-    return {"message": "Welcome to the Immigration Law Chatbot API"}
+SYSTEM_PROMPT = "You are a concise, expert immigration chatbot."
 
-@app.get("/ask")
-def ask_question(query: str):
-    print(f"🔍 Received query: {query}")  
+# "separate": one call for the answer, timestamp found afterwards.
+# "combined": one structured-output call returns the answer plus the transcript segment ids it used.
+ANSWER_MODE = os.getenv("ANSWER_MODE", "separate")
 
-    # Load transcript
-    full_transcript_text, structured_transcript = get_full_transcript()
-    print("📜 Loaded full transcript.")  
+ANSWER_SCHEMA = {
+    "name": "answer_with_segments",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "answer": {"type": "string"},
+            "segment_ids": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["answer", "segment_ids"],
+        "additionalProperties": False
+    }
+}
 
-    # Generate AI response
-    chat_prompt = f"""
+def build_chat_prompt(query, transcript_context):
+    """Prompt for the answer call, built from the retrieved transcript excerpts."""
+    return f"""
     You are a legal chatbot specializing in U.S. immigration law.
     Use your knowledge + the podcast transcript to answer user queries.
 
     **User Question:** {query}
 
-    **Podcast Transcript:** (Full text provided)
-    {full_transcript_text}
+    **Podcast Transcript Excerpts:** (most relevant sections by episode; each line is "[start time in seconds] text")
+    {transcript_context or "(No closely matching sections found.)"}
 
     Answer in **under 300 words**. Be **direct** but informative.
     """
 
+async def generate_answer(client, chat_prompt):
+    """Single GPT-4o call for the answer text."""
+    response = await client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": chat_prompt}
+        ]
+    )
+    return response.choices[0].message.content.strip()
+
+async def locate_early_timestamp(query, passages, client):
+    """Parallel mode: locate (timestamp, episode) from the query and retrieved passages, before the answer exists."""
+    passage_text = " ".join(passage["text"] for passage in passages)
+    return await find_best_video_segment(query, passage_text, llm_client=client, context_is_transcript=True)
+
+def finish_early_timestamp(early_timestamp, query, chat_response):
+    """Optionally refine a parallel-mode (timestamp, episode) locally now that the answer has arrived."""
+    if TIMESTAMP_REFINE:
+        refined = refine_timestamp(query, chat_response)
+        if refined is not None:
+            return refined
+    return early_timestamp
+
+def build_answer(chat_response, best_timestamp, episode_id):
+    """Response payload (also what the answer caches store), pointing at the matching episode's video."""
+    episode = get_episode(episode_id) or {}
+    return {
+        "response": chat_response,
+        "timestamp": best_timestamp,
+        "video_url": episode.get("video_url"),
+        "episode": episode.get("id"),
+        "episode_date": episode.get("date")
+    }
+
+def build_combined_prompt(query, segment_context):
+    """Prompt for combined mode: the excerpts carry segment ids the model must cite."""
+    return f"""
+    You are a legal chatbot specializing in U.S. immigration law.
+    Use your knowledge + the podcast transcript to answer user queries.
+
+    **User Question:** {query}
+
+    **Podcast Transcript Excerpts:** (each line is "[#episode/segment id] text")
+    {segment_context or "(No closely matching sections found.)"}
+
+    Answer in **under 300 words**. Be **direct** but informative.
+    Return JSON with `answer` and `segment_ids`: the ids of the excerpt lines that best
+    support the answer (e.g. "march_11/42"), most relevant first (an empty list if none apply).
+    """
+
+async def generate_answer_with_segments(client, chat_prompt):
+    """Single structured-output GPT-4o call returning (answer, segment_ids)."""
+    response = await client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": chat_prompt}
+        ],
+        response_format={"type": "json_schema", "json_schema": ANSWER_SCHEMA}
+    )
+    result = json.loads(response.choices[0].message.content)
+    return result["answer"].strip(), result.get("segment_ids", [])
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def lookup_cached_answer(request, query):
+    """
+    Check the exact-match cache, then the semantic cache.
+
+    Returns (cached_answer_or_None, cache_key, query_vector); the key and vector are
+    passed back to store_answer so a miss doesn't embed the query twice.
+    """
+    answer_cache = request.app.state.answer_cache
+    cache_key = answer_cache.make_key(query, corpus.fingerprint)
+    cached = answer_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Answer cache hit.")
+        return cached, cache_key, None
+
+    semantic_cache = request.app.state.semantic_cache
+    if semantic_cache is None or request.app.state.embedder is None:
+        return None, cache_key, None
+
+    try:
+        query_vector = await embed_query(request.app.state.embedder, query)
+    except Exception as e:
+        print(f"⚠️ Could not embed query for the semantic cache: {e}")
+        return None, cache_key, None
+
+    cached = semantic_cache.lookup(query_vector, corpus.fingerprint)
+    if cached is not None:
+        answer_cache.set(cache_key, cached)  # next time this exact wording is a free hit
+    return cached, cache_key, query_vector
+
+async def retrieval_vector(request, query, query_vector):
+    """
+    Query embedding for hybrid retrieval: the semantic cache's if there is one, else a
+    fresh one. None when there's no vector index built with the current embedding model.
+    """
+    embedder = request.app.state.embedder
+    vector_index = get_vector_index()
+    if not HYBRID_RETRIEVAL or embedder is None or vector_index is None or vector_index.model != embedder.model_id:
+        return None
+    if query_vector is not None:
+        return query_vector
+    try:
+        return await embed_query(embedder, query)
+    except Exception as e:
+        print(f"⚠️ Could not embed query for vector retrieval, using BM25 only: {e}")
+        return None
+
+def store_answer(request, query, cache_key, query_vector, answer):
+    """Remember a freshly generated answer in both caches."""
+    request.app.state.answer_cache.set(cache_key, answer)
+    if query_vector is not None and request.app.state.semantic_cache is not None:
+        request.app.state.semantic_cache.add(query_vector, query, corpus.fingerprint, answer)
+
+@app.get("/")
+def home():
+    return {"message": "Welcome to the Immigration Law Chatbot API"}
+
+@app.get("/metrics")
+def metrics(request: Request):
+    semantic_cache = request.app.state.semantic_cache
+    return {
+        "answer_cache": request.app.state.answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None
+    }
+
+@app.get("/search")
+def search_phrase(q: str, limit: int = Query(20, ge=1, le=200)):
+    """Exact phrase lookup ("public charge", "I-140") across every episode, with start times and video links."""
+    started = time.perf_counter()
+    index = get_positional_index()
+    total = index.count(q)
+    hits = index.lookup(q, limit=limit)
+    elapsed_us = round((time.perf_counter() - started) * 1e6, 1)
+
+    for hit in hits:
+        episode = get_episode(hit["episode"]) or {}
+        hit["episode_date"] = episode.get("date")
+        hit["video_url"] = episode.get("video_url")
+    return {"query": q, "total": total, "hits": hits, "elapsed_us": elapsed_us}
+
+@app.get("/segment")
+def find_segment(episode: str = None, t: str = None, offset: int = None):
+    """
+    Time-coded navigation: the segment spoken at time `t` (seconds, MM:SS or H:MM:SS)
+    or containing character `offset` of the joined transcript. Defaults to the latest episode.
+    """
+    entry = corpus.get(episode) if episode else corpus.latest()
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown episode: {episode}")
+    if (t is None) == (offset is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of `t` or `offset`.")
+
+    episode_id = entry["episode"]["id"]
+    if t is not None:
+        try:
+            segment = segment_at_time(episode_id, parse_timecode(t))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        segment = segment_at_offset(episode_id, offset)
+    if segment is None:
+        raise HTTPException(status_code=404, detail="No segment at that position.")
+
+    return dict(
+        segment,
+        timestamp=int(segment["start_time"]),
+        video_url=entry["episode"].get("video_url"),
+        episode_date=entry["episode"].get("date")
+    )
+
+@app.get("/ask")
+async def ask_question(query: str, request: Request):
+    print(f"🔍 Received query: {query}")  
+    request_started = time.perf_counter()
+
+    # Serve repeated and paraphrased questions from the answer caches
+    cached, cache_key, query_vector = await lookup_cached_answer(request, query)
+    if cached is not None:
+        return dict(cached, cached=True, timings={"total_ms": round((time.perf_counter() - request_started) * 1000, 2)})
+
+    # Retrieve only the most relevant transcript chunks, across every episode, for the prompt
+    transcript_context, passages, timings = retrieve_context(
+        query, query_vector=await retrieval_vector(request, query, query_vector)
+    )
+    print(f"📑 Retrieved {len(passages)} transcript chunk(s) (~{timings['context_tokens']} tokens).")
+
+    # Generate AI response
+    combined = ANSWER_MODE == "combined"
+    if combined:
+        chat_prompt = build_combined_prompt(query, format_segment_context(passages))
+    else:
+        chat_prompt = build_chat_prompt(query, transcript_context)
+    timings["prompt_tokens"] = count_tokens(chat_prompt)
+    print(f"🧮 Answer prompt: {timings['prompt_tokens']} tokens")
+
     print("🤖 Sending request to OpenAI for response...")  
-    client = openai.OpenAI(api_key=api_key)
+    client = request.app.state.openai_client
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a concise, expert immigration chatbot."},
-                {"role": "user", "content": chat_prompt}
-            ]
-        )
-        chat_response = response.choices[0].message.content.strip()
+        started = time.perf_counter()
+        if combined:
+            chat_response, segment_ids = await generate_answer_with_segments(client, chat_prompt)
+        elif TIMESTAMP_MODE == "parallel":
+            # Answer generation and timestamp lookup share one round of latency
+            chat_response, early_timestamp = await asyncio.gather(
+                generate_answer(client, chat_prompt),
+                locate_early_timestamp(query, passages, client)
+            )
+        else:
+            chat_response = await generate_answer(client, chat_prompt)
+        timings["generation_ms"] = round((time.perf_counter() - started) * 1000, 2)
         print("✅ AI Response received.")  
     except Exception as e:
         print(f"❌ ERROR generating AI response: {e}")
@@ -71,20 +318,110 @@ def ask_question(query: str):
             "video_url": None
         }
 
-    # Find the best timestamp
-    best_timestamp = find_best_video_segment(
-        query,
-        chat_response,
-        full_transcript_text,
-        structured_transcript,
-        video_duration=3600  # 1 hour max for external video fallback
+    # Find the best timestamp (and the episode it's in)
+    started = time.perf_counter()
+    located = None
+    if combined:
+        located = resolve_segment_timestamp(segment_ids)
+    elif TIMESTAMP_MODE == "parallel":
+        located = finish_early_timestamp(early_timestamp, query, chat_response)
+
+    # Sequential mode, or the model cited no usable segment
+    if located is None:
+        located = await find_best_video_segment(query, chat_response, llm_client=client)
+    best_timestamp, episode_id = located
+    timings["timestamp_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    timings["total_ms"] = round((time.perf_counter() - request_started) * 1000, 2)
+    print(f"⏱️ Timings: {timings}")
+
+    answer = build_answer(chat_response, best_timestamp, episode_id)
+    store_answer(request, query, cache_key, query_vector, answer)
+
+    return dict(answer, cached=False, timings=timings)
+
+@app.get("/ask/stream")
+async def ask_question_stream(query: str, request: Request):
+    """
+    Stream the answer as Server-Sent Events.
+
+    Emits `token` events as GPT-4o produces text, then a `timestamp` event with the
+    video position once the full answer is known, then `done`. Failures are sent
+    as an `error` event.
+    """
+    print(f"🔍 Received streaming query: {query}")
+    request_started = time.perf_counter()
+
+    cached, cache_key, query_vector = await lookup_cached_answer(request, query)
+    if cached is not None:
+
+        async def cached_events():
+            yield sse_event("token", {"text": cached["response"]})
+            yield sse_event("timestamp", {key: cached.get(key) for key in ("timestamp", "video_url", "episode", "episode_date")})
+            yield sse_event("done", {"cached": True})
+
+        return StreamingResponse(cached_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    transcript_context, passages, timings = retrieve_context(
+        query, query_vector=await retrieval_vector(request, query, query_vector)
     )
+    chat_prompt = build_chat_prompt(query, transcript_context)
+    timings["prompt_tokens"] = count_tokens(chat_prompt)
+    client = request.app.state.openai_client
 
-    return {
-        "response": chat_response,
-        "timestamp": best_timestamp,
-        "video_url": EXTERNAL_VIDEO_URL
-    }
+    async def events():
+        chunks = []
+        early_timestamp = None
+        if TIMESTAMP_MODE == "parallel":
+            early_timestamp = asyncio.create_task(
+                locate_early_timestamp(query, passages, client)
+            )
+
+        try:
+            stream = await client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": chat_prompt}
+                ],
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                if not chunks:
+                    timings["first_token_ms"] = round((time.perf_counter() - request_started) * 1000, 2)
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            print(f"❌ ERROR streaming AI response: {e}")
+            if early_timestamp is not None:
+                early_timestamp.cancel()
+            yield sse_event("error", {"message": f"❌ Error generating AI response: {e}"})
+            return
+
+        chat_response = "".join(chunks).strip()
+        timings["generation_ms"] = round((time.perf_counter() - request_started) * 1000, 2)
+
+        if early_timestamp is not None:
+            best_timestamp, episode_id = finish_early_timestamp(await early_timestamp, query, chat_response)
+        else:
+            best_timestamp, episode_id = await find_best_video_segment(query, chat_response, llm_client=client)
+        timings["total_ms"] = round((time.perf_counter() - request_started) * 1000, 2)
+        print(f"⏱️ Streaming timings: {timings}")
+        answer = build_answer(chat_response, best_timestamp, episode_id)
+        store_answer(request, query, cache_key, query_vector, answer)
+
+        yield sse_event("timestamp", {key: answer[key] for key in ("timestamp", "video_url", "episode", "episode_date")})
+        yield sse_event("done", {"cached": False, "timings": timings})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
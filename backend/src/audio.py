@@ -0,0 +1,149 @@
+import bisect
+import os
+import subprocess
+import numpy as np
+
+# Constants
+SAMPLE_RATE = 16000     # what Whisper expects
+PCM_SUFFIX = ".pcm"     # raw 16-bit mono PCM cached next to the video: march_11.mp4 -> march_11.mp4.pcm
+TRIM_SILENCE = os.getenv("TRANSCRIBE_TRIM_SILENCE", "1") == "1"  # drop long non-speech stretches before Whisper
+
+# Energy VAD
+VAD_FRAME_SECONDS = 0.03
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))  # speech is this far above the recording's noise floor
+VAD_MIN_DB = -50.0              # ...and never quieter than this (dBFS), so a silent floor doesn't let hiss through
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "2"))  # shorter pauses are kept as they are
+VAD_PAD_SECONDS = 0.3           # kept around every speech span so word edges aren't clipped
+
+
+def pcm_path_for(video_path):
+    return video_path + PCM_SUFFIX
+
+
+def extract_pcm(video_path, pcm_path=None):
+    """
+    Decode the video's audio track to 16 kHz mono 16-bit PCM once, through ffmpeg.
+
+    The cache is reused while it is newer than the video; ffmpeg writes it under a
+    temporary name so an interrupted extraction is never mistaken for a finished one.
+    """
+    pcm_path = pcm_path or pcm_path_for(video_path)
+    if os.path.exists(pcm_path) and os.path.getmtime(pcm_path) >= os.path.getmtime(video_path):
+        return pcm_path
+
+    partial_path = pcm_path + ".partial"
+    command = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-acodec", "pcm_s16le", partial_path,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to extract audio from {video_path}: {e.stderr.decode(errors='replace')}") from e
+    os.replace(partial_path, pcm_path)
+    return pcm_path
+
+
+def load_pcm(video_path):
+    """The video's audio as a memory-mapped int16 array, extracting it first if needed."""
+    pcm_path = extract_pcm(video_path)
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(pcm_path, dtype=np.int16, mode="r")
+
+
+def frame_levels(pcm, frame_seconds=VAD_FRAME_SECONDS):
+    """RMS level of every frame in dBFS."""
+    frame = int(frame_seconds * SAMPLE_RATE)
+    frames = len(pcm) // frame
+    levels = np.empty(frames, dtype=np.float32)
+    step = 100_000  # frames per block, so a long memmap is never converted to float all at once
+    for first in range(0, frames, step):
+        block = np.asarray(pcm[first * frame:min(frames, first + step) * frame], dtype=np.float32) / 32768.0
+        rms = np.sqrt(np.mean(block.reshape(-1, frame) ** 2, axis=1))
+        levels[first:first + len(rms)] = 20 * np.log10(np.maximum(rms, 1e-10))
+    return levels
+
+
+def speech_spans(pcm, min_silence_seconds=VAD_MIN_SILENCE_SECONDS, pad_seconds=VAD_PAD_SECONDS):
+    """
+    [(start, end)] sample ranges to keep: everything except silences longer than min_silence_seconds.
+
+    A frame counts as speech when it is VAD_THRESHOLD_DB above the noise floor (the
+    10th percentile frame level). Each span is padded by pad_seconds on both sides.
+    """
+    if len(pcm) == 0:
+        return []
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    levels = frame_levels(pcm)
+    if len(levels) == 0:
+        return [(0, len(pcm))]
+
+    threshold = max(np.percentile(levels, 10) + VAD_THRESHOLD_DB, VAD_MIN_DB)
+    loud = np.flatnonzero(levels > threshold)
+    if len(loud) == 0:
+        return []
+
+    pad = int(pad_seconds / VAD_FRAME_SECONDS)
+    gap = int(min_silence_seconds / VAD_FRAME_SECONDS)
+    breaks = np.flatnonzero(np.diff(loud) > gap)
+    spans = []
+    for first, last in zip(np.concatenate([[0], breaks + 1]), np.concatenate([breaks, [len(loud) - 1]])):
+        start = max(0, (loud[first] - pad) * frame)
+        end = min(len(pcm), (loud[last] + 1 + pad) * frame)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((int(start), int(end)))
+    return spans
+
+
+class OffsetMap:
+    """Maps times in trimmed audio back to the original video, span by span."""
+
+    def __init__(self, spans):
+        self.trimmed_starts = []  # seconds into the trimmed audio where each kept span begins
+        self.original_starts = []
+        position = 0
+        for start, end in spans:
+            self.trimmed_starts.append(position / SAMPLE_RATE)
+            self.original_starts.append(start / SAMPLE_RATE)
+            position += end - start
+
+    def to_original(self, t):
+        if not self.trimmed_starts:
+            return t
+        i = max(0, bisect.bisect_right(self.trimmed_starts, t) - 1)
+        return round(self.original_starts[i] + t - self.trimmed_starts[i], 3)
+
+    def segment(self, segment):
+        """A {"start", "end"[, "words"]} segment in trimmed time -> the same segment in video time."""
+        mapped = dict(segment, start=self.to_original(segment["start"]), end=self.to_original(segment["end"]))
+        if "words" in segment:
+            mapped["words"] = [
+                dict(word, start=self.to_original(word["start"]), end=self.to_original(word["end"]))
+                for word in segment["words"]
+            ]
+        return mapped
+
+
+def prepare_audio(video_path, trim_silence=TRIM_SILENCE):
+    """
+    Float32 audio ready for Whisper and the OffsetMap back to video time.
+
+    The PCM is extracted once and cached next to the video; with trim_silence, long
+    non-speech stretches are cut out so Whisper only decodes the spans worth hearing.
+    """
+    pcm = load_pcm(video_path)
+    spans = speech_spans(pcm) if trim_silence else [(0, len(pcm))]
+    audio = np.empty(sum(end - start for start, end in spans), dtype=np.float32)
+    position = 0
+    for start, end in spans:
+        audio[position:position + end - start] = pcm[start:end]
+        position += end - start
+    audio /= 32768.0
+
+    if trim_silence and len(pcm):
+        kept = len(audio) / len(pcm)
+        print(f"✂️ {video_path}: keeping {len(audio) / SAMPLE_RATE:.0f}s of {len(pcm) / SAMPLE_RATE:.0f}s ({kept:.0%}) as speech")
+    return audio, OffsetMap(spans)
@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Answer cache settings (override with environment variables)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))    # max entries kept in memory
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))   # seconds before an answer goes stale
+ANSWER_CACHE_DB = os.getenv("ANSWER_CACHE_DB", "")                 # e.g. "data/answer_cache.sqlite3" to persist
+
+# Semantic cache settings
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # min cosine similarity for a hit
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+
+
+def normalize_query(query):
+    """Fold case, punctuation and whitespace so trivially different questions share a key."""
+    query = re.sub(r"[^\w\s]", "", query.lower())
+    return " ".join(query.split())
+
+
+class AnswerCache:
+    """
+    Exact-match cache of /ask responses with LRU eviction and a TTL.
+
+    Keys combine the normalized query with the corpus fingerprint, so answers are
+    never served from an older set of transcripts. When a SQLite path is given,
+    entries are also written there and reloaded on startup.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, db_path=ANSWER_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (created_at, value)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value TEXT, created_at REAL)")
+            self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - ttl,))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, value, created_at FROM answers ORDER BY created_at DESC LIMIT ?", (max_entries,)
+            ).fetchall()
+            for key, value, created_at in reversed(rows):
+                self.entries[key] = (created_at, json.loads(value))
+            print(f"💾 Loaded {len(rows)} cached answer(s) from {db_path}")
+
+    @staticmethod
+    def make_key(query, corpus_version):
+        return f"{corpus_version}:{normalize_query(query)}"
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss or an expired entry."""
+        with self._lock:
+            item = self.entries.get(key)
+            if item is not None and time.time() - item[0] > self.ttl:
+                self._delete(key)
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            created_at = time.time()
+            self.entries[key] = (created_at, value)
+            self.entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created_at)
+                )
+                self._db.commit()
+
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self._delete(oldest)
+
+    def _delete(self, key):
+        self.entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+            "persistent": self._db is not None,
+        }
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of /ask responses keyed by query embeddings.
+
+    Embeddings live in one preallocated float32 matrix so a lookup is a single
+    matrix-vector product. A prior answer is reused when its query's cosine
+    similarity is at least `threshold` and it was produced from the same corpus.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_SIZE, ttl=ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectors = None                # (max_entries, dim), allocated on the first insert
+        self.valid = np.zeros(max_entries, dtype=bool)
+        self.slots = OrderedDict()         # slot -> metadata, in LRU order
+        self.hits = 0
+        self.misses = 0
+        self.last_similarity = None
+        self._lock = threading.Lock()
+
+    def lookup(self, vector, corpus_version):
+        """Return the cached value for the most similar prior query, or None."""
+        with self._lock:
+            best = None
+            if self.slots:
+                similarities = self.vectors @ vector
+                similarities[~self.valid] = -1.0
+                now = time.time()
+                for slot in np.argsort(-similarities)[:5]:
+                    slot = int(slot)
+                    if similarities[slot] < self.threshold:
+                        break
+                    entry = self.slots[slot]
+                    if entry["corpus_version"] != corpus_version or now - entry["created_at"] > self.ttl:
+                        continue
+                    best = slot
+                    break
+                self.last_similarity = float(similarities.max())
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.slots.move_to_end(best)
+            self.hits += 1
+            print(f"🧠 Semantic cache hit: \"{self.slots[best]['query']}\" (similarity {similarities[best]:.3f})")
+            return self.slots[best]["value"]
+
+    def add(self, vector, query, corpus_version, value):
+        """Remember an answer, recycling the least recently used slot when full."""
+        with self._lock:
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+            if len(self.slots) < self.max_entries:
+                slot = int(np.argmin(self.valid))  # first free slot
+            else:
+                slot, _ = self.slots.popitem(last=False)
+
+            self.vectors[slot] = vector
+            self.valid[slot] = True
+            self.slots[slot] = {
+                "query": query,
+                "corpus_version": corpus_version,
+                "created_at": time.time(),
+                "value": value,
+            }
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.slots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "last_similarity": self.last_similarity,
+        }
@@ -3,11 +3,11 @@ import sys
 import os
 import json
 from openai import OpenAI
-from search import search_transcript, get_most_relevant_timestamp
 import yaml
 
-# Ensure the `src/` folder is included in Python's path
-sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+# Ensure the `backend/` folder is included in Python's path so `src.*` imports resolve
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.search import search_transcript, get_most_relevant_timestamp
 
 # Load API key from config.yaml
 def load_config():
@@ -0,0 +1,122 @@
+import json
+import os
+import tiktoken
+
+# Constants
+PROMPT_MODEL = "gpt-4o"
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "120"))                   # target size of one chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))    # tokens repeated between neighbours
+SPEAKING_RATE = 2.5  # words per second, used to estimate when the final segment ends
+
+_encoding = None
+
+def count_tokens(text):
+    """Count GPT-4o tokens with tiktoken, or estimate (~4 characters per token) if the encoding can't load."""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(PROMPT_MODEL)
+        except Exception as e:
+            print(f"⚠️ Could not load tiktoken encoding, estimating token counts: {e}")
+            _encoding = False
+
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+def tokenizer_name():
+    """Which token counter chunk sizes were measured with (persisted chunks are rebuilt if it changes)."""
+    count_tokens("")
+    return _encoding.name if _encoding else "estimate"
+
+def segment_end_time(segments, i):
+    """End of segment i: its own end if recorded, else the next segment's start, else an estimate."""
+    segment = segments[i]
+    if "end_time" in segment:
+        return segment["end_time"]
+    if i + 1 < len(segments):
+        return segments[i + 1]["start_time"]
+    return round(segment["start_time"] + len(segment["text"].split()) / SPEAKING_RATE, 2)
+
+def chunk_segments(segments, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Merge adjacent Whisper segments into overlapping chunks of about chunk_tokens tokens.
+
+    Each chunk has an id, start_time, end_time, source segment_ids, text and token count.
+    Consecutive chunks share roughly overlap_tokens tokens of trailing segments.
+    """
+    segment_tokens = [count_tokens(segment["text"]) for segment in segments]
+    chunks = []
+    start = 0
+
+    while start < len(segments):
+        end = start
+        tokens = 0
+        while end < len(segments) and (tokens < chunk_tokens or end == start):
+            tokens += segment_tokens[end]
+            end += 1
+
+        chunks.append({
+            "id": len(chunks),
+            "start_time": segments[start]["start_time"],
+            "end_time": segment_end_time(segments, end - 1),
+            "segment_ids": list(range(start, end)),
+            "text": " ".join(segment["text"].strip() for segment in segments[start:end]),
+            "tokens": tokens,
+        })
+        if end == len(segments):
+            break
+
+        # Step back over trailing segments until the overlap is covered, always moving forward
+        next_start = end
+        overlap = 0
+        while next_start - 1 > start and overlap + segment_tokens[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += segment_tokens[next_start]
+        start = next_start
+
+    return chunks
+
+def chunks_path(transcript_path):
+    """Chunks are persisted next to the transcript: structured_transcripts/chunks/<name>.json."""
+    directory, name = os.path.split(transcript_path)
+    return os.path.join(directory, "chunks", name)
+
+def load_or_build_chunks(transcript_path, segments, source_sha256):
+    """Reuse the persisted chunks for a transcript if they match its content hash, else rebuild and save them."""
+    path = chunks_path(transcript_path)
+    settings = {
+        "source_sha256": source_sha256,
+        "chunk_tokens": CHUNK_TOKENS,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+        "tokenizer": tokenizer_name(),
+    }
+
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            saved = json.load(f)
+        if all(saved.get(key) == value for key, value in settings.items()):
+            return saved["chunks"]
+
+    chunks = chunk_segments(segments)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(dict(settings, chunks=chunks), f)
+        print(f"🧩 Wrote {len(chunks)} chunks → {path}")
+    except OSError as e:
+        print(f"⚠️ Could not persist chunks for {transcript_path}: {e}")
+    return chunks
+
+
+if __name__ == "__main__":
+    from src.corpus import TRANSCRIPTS_DIR
+    import hashlib
+
+    for name in sorted(os.listdir(TRANSCRIPTS_DIR)):
+        if name.endswith(".json"):
+            transcript_path = os.path.join(TRANSCRIPTS_DIR, name)
+            with open(transcript_path, "rb") as f:
+                raw = f.read()
+            chunks = load_or_build_chunks(transcript_path, json.loads(raw), hashlib.sha256(raw).hexdigest())
+            print(f"✅ {transcript_path}: {len(chunks)} chunks")
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Constants
+COLUMNAR_DIR = "data/corpus"  # converted from the structured transcript JSON by `python -m src.columnar`
+MANIFEST_FILE = "manifest.json"
+COLUMNS = {  # file name -> dtype, one value per segment (offsets has one extra)
+    "start_time.npy": np.float64,
+    "end_time.npy": np.float64,   # NaN when the transcript didn't record an end
+    "episode.npy": np.int32,      # row of the segment's episode in the manifest
+    "offsets.npy": np.int64,      # segment i's text is text.bin[offsets[i]:offsets[i + 1] - 1]
+    "avg_logprob.npy": np.float64,     # NaN when the transcript didn't record it
+    "words_offsets.npy": np.int64,     # segment i's word timings are words.bin[words_offsets[i]:words_offsets[i + 1]]
+}
+TEXT_FILE = "text.bin"  # every segment's UTF-8 text, each followed by "\n"
+WORDS_FILE = "words.bin"  # every segment's "words" list as compact JSON (empty when it has none)
+
+
+def map_bytes(path):
+    return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+
+class ColumnarSegments:
+    """
+    Read-only view of one episode's segments in a ColumnarStore.
+
+    Behaves like the list of {"start_time", "text"[, "end_time", "avg_logprob", "words"]}
+    dicts parsed from the JSON transcript, but each dict is built on access from the
+    memory-mapped columns.
+    """
+
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        return self.store.segment(self.start + i)
+
+    def __iter__(self):
+        for row in range(self.start, self.stop):
+            yield self.store.segment(row)
+
+
+class ColumnarStore:
+    """
+    Every episode's segments as memory-mapped NumPy columns plus UTF-8 blobs for the
+    text and the (optional) word timings.
+
+    Opening the store only maps the files, so startup doesn't parse anything and
+    several uvicorn workers share the same pages of the OS page cache. The manifest
+    records each episode's source JSON (path, mtime, SHA-256) and its segment range.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.episodes = {episode["id"]: episode for episode in manifest["episodes"]}
+        self.columns = {
+            name: np.load(os.path.join(directory, name), mmap_mode="r") for name in COLUMNS
+        }
+        self.text = map_bytes(os.path.join(directory, TEXT_FILE))
+        self.words = map_bytes(os.path.join(directory, WORDS_FILE))
+
+    @classmethod
+    def open(cls, directory=COLUMNAR_DIR):
+        """Map the store, or return None if it hasn't been converted yet (or was converted by an older version)."""
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not all(os.path.exists(os.path.join(directory, name)) for name in [MANIFEST_FILE, *COLUMNS, TEXT_FILE, WORDS_FILE]):
+            return None
+        with open(manifest_path, "r") as f:
+            return cls(directory, json.load(f))
+
+    def episode(self, episode_id):
+        """Manifest entry {"id", "source", "mtime", "sha256", "start", "stop"} for an episode, or None."""
+        return self.episodes.get(episode_id)
+
+    def segment(self, row):
+        offsets = self.columns["offsets.npy"]
+        segment = {
+            "start_time": float(self.columns["start_time.npy"][row]),
+            "text": self.text[offsets[row]:offsets[row + 1] - 1].tobytes().decode("utf-8"),
+        }
+        end_time = float(self.columns["end_time.npy"][row])
+        if not np.isnan(end_time):
+            segment["end_time"] = end_time
+        avg_logprob = float(self.columns["avg_logprob.npy"][row])
+        if not np.isnan(avg_logprob):
+            segment["avg_logprob"] = avg_logprob
+        words_offsets = self.columns["words_offsets.npy"]
+        if words_offsets[row + 1] > words_offsets[row]:
+            segment["words"] = json.loads(self.words[words_offsets[row]:words_offsets[row + 1]].tobytes())
+        return segment
+
+    def segments(self, episode_id):
+        episode = self.episodes[episode_id]
+        return ColumnarSegments(self, episode["start"], episode["stop"])
+
+    def full_text(self, episode_id):
+        """The episode's segment texts joined by newlines, decoded in one go."""
+        episode = self.episodes[episode_id]
+        if episode["start"] == episode["stop"]:
+            return ""
+        offsets = self.columns["offsets.npy"]
+        return self.text[offsets[episode["start"]]:offsets[episode["stop"]] - 1].tobytes().decode("utf-8")
+
+
+def write_store(episodes, directory=COLUMNAR_DIR):
+    """
+    Write a store from [(manifest info {"id", "source", "mtime", "sha256"}, segments)].
+
+    Files are written under temporary names and renamed into place, manifest last,
+    so a running server keeps reading its existing mapping until it reopens the store.
+    """
+    os.makedirs(directory, exist_ok=True)
+    starts, ends, episode_rows, offsets, logprobs, words_offsets = [], [], [], [0], [], [0]
+    manifest = []
+    with open(os.path.join(directory, TEXT_FILE + ".tmp"), "wb") as text_file, \
+            open(os.path.join(directory, WORDS_FILE + ".tmp"), "wb") as words_file:
+        for row, (info, segments) in enumerate(episodes):
+            manifest.append(dict(info, start=len(starts), stop=len(starts) + len(segments)))
+            for segment in segments:
+                encoded = segment["text"].encode("utf-8") + b"\n"
+                text_file.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+                words = json.dumps(segment["words"], separators=(",", ":")).encode("utf-8") if segment.get("words") else b""
+                words_file.write(words)
+                words_offsets.append(words_offsets[-1] + len(words))
+                starts.append(segment["start_time"])
+                ends.append(segment.get("end_time", np.nan))
+                logprobs.append(segment.get("avg_logprob", np.nan))
+                episode_rows.append(row)
+
+    values = {
+        "start_time.npy": starts, "end_time.npy": ends, "episode.npy": episode_rows, "offsets.npy": offsets,
+        "avg_logprob.npy": logprobs, "words_offsets.npy": words_offsets,
+    }
+    for name, dtype in COLUMNS.items():
+        with open(os.path.join(directory, name + ".tmp"), "wb") as f:
+            np.save(f, np.asarray(values[name], dtype=dtype))
+
+    with open(os.path.join(directory, MANIFEST_FILE + ".tmp"), "w") as f:
+        json.dump({"episodes": manifest}, f)
+    for name in [*COLUMNS, TEXT_FILE, WORDS_FILE, MANIFEST_FILE]:
+        os.replace(os.path.join(directory, name + ".tmp"), os.path.join(directory, name))
+
+
+def convert(registry, directory=COLUMNAR_DIR):
+    """
+    Convert every registered episode's structured JSON transcript into the columnar store.
+
+    `registry` is the output of corpus.load_episode_registry. Episodes whose JSON hasn't
+    changed since the last conversion (same SHA-256) are copied over from the existing
+    store instead of being parsed again.
+    """
+    existing = ColumnarStore.open(directory)
+    episodes = []
+    parsed = 0
+
+    for episode_id, episode in registry.items():
+        path = episode["transcript"]
+        if not os.path.exists(path):
+            print(f"⚠️ Transcript for episode {episode_id} not found: {path}")
+            continue
+
+        mtime = os.path.getmtime(path)
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        previous = existing.episode(episode_id) if existing is not None else None
+        if previous is not None and previous["sha256"] == digest:
+            segments = list(existing.segments(episode_id))
+        else:
+            segments = json.loads(raw)
+            parsed += 1
+        episodes.append(({"id": episode_id, "source": path, "mtime": mtime, "sha256": digest}, segments))
+
+    write_store(episodes, directory)
+    total = sum(len(segments) for _, segments in episodes)
+    print(f"✅ Wrote columnar corpus → {directory}: {len(episodes)} episode(s), {total} segments ({parsed} parsed from JSON)")
+
+
+if __name__ == "__main__":
+    from src.corpus import load_episode_registry
+
+    convert(load_episode_registry())
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from src.chunker import load_or_build_chunks
+from src.columnar import COLUMNAR_DIR, MANIFEST_FILE, ColumnarStore
+
+# Constants
+TRANSCRIPTS_DIR = "data/structured_transcripts"
+EPISODES_FILE = "data/episodes.json"  # registry: id, date, transcript path, video URL, duration
+REFRESH_INTERVAL = float(os.getenv("CORPUS_REFRESH_INTERVAL", "30"))  # seconds between file checks
+
+
+def load_episode_registry(episodes_file=EPISODES_FILE, transcripts_dir=TRANSCRIPTS_DIR):
+    """
+    Read the episode manifest and add any transcript in transcripts_dir it doesn't list.
+
+    Returns {episode id: {"id", "date", "transcript", "video_url", "duration"}}. Unlisted
+    transcripts are registered under their file name with no date, video or duration.
+    """
+    episodes = {}
+    if os.path.exists(episodes_file):
+        with open(episodes_file, "r") as f:
+            for episode in json.load(f):
+                episodes[episode["id"]] = {
+                    "id": episode["id"],
+                    "date": episode.get("date"),
+                    "transcript": os.path.normpath(episode["transcript"]),
+                    "video_url": episode.get("video_url"),
+                    "duration": episode.get("duration"),
+                }
+
+    registered = {episode["transcript"] for episode in episodes.values()}
+    names = sorted(os.listdir(transcripts_dir)) if os.path.isdir(transcripts_dir) else []
+    for name in names:
+        path = os.path.normpath(os.path.join(transcripts_dir, name))
+        if name.endswith(".json") and path not in registered:
+            episode_id = os.path.splitext(name)[0]
+            episodes.setdefault(episode_id, {
+                "id": episode_id, "date": None, "transcript": path, "video_url": None, "duration": None
+            })
+
+    return episodes
+
+
+class TranscriptCorpus:
+    """
+    Process-wide, in-memory cache of every episode's structured transcript.
+
+    Episodes come from the registry (see load_episode_registry). Each transcript is
+    parsed once and kept as its segment list, the joined full text and its retrieval
+    chunks (see src/chunker.py). A background watcher re-checks the files and only
+    re-parses one when its mtime *and* its SHA-256 content hash have changed, so
+    requests never touch the filesystem. Indexes derived from the corpus register with
+    on_change() and are rebuilt by whichever thread refreshed it (normally the watcher).
+
+    When the columnar store (src/columnar.py) has an up-to-date copy of a transcript,
+    its segments are served from the memory-mapped store and the JSON isn't read at all.
+    """
+
+    def __init__(self, transcripts_dir=TRANSCRIPTS_DIR, episodes_file=EPISODES_FILE, columnar_dir=COLUMNAR_DIR):
+        self.transcripts_dir = transcripts_dir
+        self.episodes_file = episodes_file
+        self.columnar_dir = columnar_dir
+        self.entries = {}  # episode id -> {"episode", "mtime", "sha256", "segments", "full_text", "chunks"}
+        self.version = 0   # bumped whenever any episode is added, changed or removed
+        self.fingerprint = ""  # content hash of the whole corpus, stable across restarts
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._listeners = []
+        self._store = None
+        self._store_mtime = None
+
+    def columnar_store(self):
+        """The columnar store, reopened only when its manifest has been rewritten; None if there isn't one."""
+        manifest_path = os.path.join(self.columnar_dir, MANIFEST_FILE)
+        mtime = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else None
+        if mtime != self._store_mtime:
+            self._store = ColumnarStore.open(self.columnar_dir) if mtime is not None else None
+            self._store_mtime = mtime
+        return self._store
+
+    def on_change(self, callback):
+        """Call callback() after every refresh that changed the corpus, in the refreshing thread."""
+        self._listeners.append(callback)
+
+    def refresh(self):
+        """Reload the registry and any new or changed transcripts. Returns True if the corpus changed."""
+        changed = self._refresh()
+        if changed:
+            for callback in self._listeners:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"❌ ERROR updating {getattr(callback, '__qualname__', callback)} after a corpus change: {e}")
+        return changed
+
+    def _refresh(self):
+        with self._lock:
+            entries = dict(self.entries)
+            changed = False
+            episodes = load_episode_registry(self.episodes_file, self.transcripts_dir)
+            store = self.columnar_store()
+            present = set()
+
+            for episode_id, episode in episodes.items():
+                path = episode["transcript"]
+                if not os.path.exists(path):
+                    print(f"⚠️ Transcript for episode {episode_id} not found: {path}")
+                    continue
+                present.add(episode_id)
+
+                mtime = os.path.getmtime(path)
+                entry = entries.get(episode_id)
+                if entry and entry["episode"] != episode:
+                    entry = dict(entry, episode=episode)  # registry details (URL, date...) changed
+                    entries[episode_id] = entry
+                    changed = True
+                if entry and entry["mtime"] == mtime:
+                    continue
+
+                stored = store.episode(episode_id) if store is not None else None
+                if stored and stored["source"] == path and stored["mtime"] == mtime:
+                    digest, raw = stored["sha256"], None  # converted copy is current: no JSON read or parse
+                else:
+                    with open(path, "rb") as f:
+                        raw = f.read()
+                    digest = hashlib.sha256(raw).hexdigest()
+
+                if entry and entry["sha256"] == digest:
+                    # Touched but not modified: remember the new mtime and skip the parse
+                    entries[episode_id] = dict(entry, mtime=mtime)
+                    continue
+
+                if raw is None:
+                    segments = store.segments(episode_id)
+                    full_text = store.full_text(episode_id)
+                else:
+                    segments = json.loads(raw)
+                    full_text = "\n".join([segment["text"] for segment in segments])
+                entries[episode_id] = {
+                    "episode": episode,
+                    "mtime": mtime,
+                    "sha256": digest,
+                    "segments": segments,
+                    "full_text": full_text,
+                    "chunks": load_or_build_chunks(path, segments, digest),
+                }
+                changed = True
+                source = "columnar store" if raw is None else path
+                print(f"📚 Loaded episode {episode_id} into corpus cache: {source} ({len(segments)} segments)")
+
+            for episode_id in set(entries) - present:
+                del entries[episode_id]
+                changed = True
+                print(f"🗑️ Dropped episode {episode_id} from corpus cache")
+
+            # Swap in a fresh dict (newest episodes first) so readers never see a half-updated corpus
+            self.entries = dict(sorted(
+                entries.items(), key=lambda item: (item[1]["episode"]["date"] or "", item[0]), reverse=True
+            ))
+            if changed:
+                self.version += 1
+                combined = "".join(
+                    f"{episode_id}:{entries[episode_id]['sha256']}:{entries[episode_id]['episode']['video_url']}\n"
+                    for episode_id in sorted(entries)
+                )
+                self.fingerprint = hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
+            self.loaded = True
+
+            return changed
+
+    def get(self, episode_id):
+        """Return the cached entry for an episode, or None if it isn't loaded."""
+        return self.entries.get(episode_id)
+
+    def latest(self):
+        """Return the most recent episode's entry, or None for an empty corpus."""
+        return next(iter(self.entries.values()), None)
+
+    def start_watcher(self, interval=REFRESH_INTERVAL):
+        """Start a daemon thread that periodically refreshes the corpus."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ ERROR refreshing transcript corpus: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="corpus-watcher", daemon=True)
+        self._watcher.start()
+
+
+# Shared instance used by the API
+corpus = TranscriptCorpus()
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+import numpy as np
+
+# Constants
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")  # "openai", or "local" (LSA, no network)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "data/index/embedding_cache.sqlite3")  # "" disables the cache
+LSA_MODEL_FILE = os.getenv("LSA_MODEL_FILE", "data/index/lsa_model.npz")
+LSA_DIMENSIONS = int(os.getenv("LSA_DIMENSIONS", "256"))
+LSA_VOCABULARY_SIZE = int(os.getenv("LSA_VOCABULARY_SIZE", "4096"))  # bounds the (vocab x vocab) matrix fit() builds
+
+
+def normalize_rows(vectors):
+    """L2-normalize each row so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+class OpenAIEmbeddingProvider:
+    """Embeddings from the OpenAI API. Pass a sync client, an AsyncOpenAI client, or both."""
+
+    batch_size = 256
+
+    def __init__(self, client=None, async_client=None, model=EMBEDDING_MODEL):
+        self.client = client
+        self.async_client = async_client
+        self.model_id = model
+
+    def embed_batch(self, texts):
+        response = self.client.embeddings.create(model=self.model_id, input=texts)
+        return normalize_rows([item.embedding for item in response.data])
+
+    async def aembed_batch(self, texts):
+        if self.async_client is None:
+            return await asyncio.to_thread(self.embed_batch, texts)
+        response = await self.async_client.embeddings.create(model=self.model_id, input=texts)
+        return normalize_rows([item.embedding for item in response.data])
+
+
+def lsa_tokens(text):
+    return re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower())
+
+
+class LocalEmbeddingProvider:
+    """
+    Latent semantic analysis embeddings: TF-IDF vectors projected onto the top
+    singular directions of the transcript corpus. Fitted offline with fit() and
+    run entirely in NumPy, so neither indexing nor queries need the network.
+    """
+
+    batch_size = 512
+
+    def __init__(self, vocabulary, idf, components):
+        self.terms = list(vocabulary)
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (vocabulary, dimensions)
+
+        # The id changes whenever the model is refitted, so cached and indexed vectors are never mixed up
+        digest = hashlib.sha256("\n".join(self.terms).encode("utf-8"))
+        digest.update(self.components.tobytes())
+        self.model_id = f"lsa-{self.components.shape[1]}-{digest.hexdigest()[:12]}"
+
+    def tfidf(self, texts):
+        """L2-normalized sublinear TF-IDF rows (texts x vocabulary)."""
+        matrix = np.zeros((len(texts), len(self.terms)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(token for token in lsa_tokens(text) if token in self.vocabulary)
+            for term, count in counts.items():
+                matrix[row, self.vocabulary[term]] = 1 + np.log(count)
+        return normalize_rows(matrix * self.idf)
+
+    def embed_batch(self, texts):
+        return normalize_rows(self.tfidf(texts) @ self.components)
+
+    async def aembed_batch(self, texts):
+        return self.embed_batch(texts)  # a small matrix product; not worth a thread hop
+
+    @classmethod
+    def fit(cls, texts, dimensions=LSA_DIMENSIONS, vocabulary_size=LSA_VOCABULARY_SIZE):
+        """
+        Fit on a list of documents (transcript chunks). The right singular vectors of
+        the TF-IDF matrix are the eigenvectors of its (vocabulary x vocabulary) Gram
+        matrix, which is accumulated in row blocks so memory doesn't grow with the corpus.
+        """
+        counts = [Counter(lsa_tokens(text)) for text in texts]
+        document_frequency = Counter()
+        for terms in counts:
+            document_frequency.update(terms.keys())
+
+        # Terms seen in a single document carry no co-occurrence signal
+        vocabulary = [term for term, df in document_frequency.most_common(vocabulary_size) if df > 1]
+        idf = np.array([np.log((1 + len(texts)) / (1 + document_frequency[term])) + 1 for term in vocabulary])
+        model = cls(vocabulary, idf, np.zeros((len(vocabulary), 0)))
+
+        gram = np.zeros((len(vocabulary), len(vocabulary)), dtype=np.float64)
+        for start in range(0, len(texts), 1024):
+            block = model.tfidf(texts[start:start + 1024])
+            gram += block.T.astype(np.float64) @ block
+
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        top = np.argsort(eigenvalues)[::-1][:min(dimensions, len(texts), len(vocabulary))]
+        print(f"🧮 Fitted LSA model: {len(vocabulary)} terms -> {len(top)} dimensions from {len(texts)} documents")
+        return cls(vocabulary, idf, eigenvectors[:, top])
+
+    def save(self, path=LSA_MODEL_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, vocabulary=np.array(self.terms), idf=self.idf, components=self.components)
+
+    @classmethod
+    def load(cls, path=LSA_MODEL_FILE):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as saved:
+            return cls(saved["vocabulary"].tolist(), saved["idf"], saved["components"])
+
+
+def create_embedding_provider(name=EMBEDDING_PROVIDER, client=None, async_client=None):
+    """The configured provider, or None if the local model hasn't been fitted yet (`python -m src.index`)."""
+    if name == "openai":
+        return OpenAIEmbeddingProvider(client=client, async_client=async_client)
+    if name == "local":
+        provider = LocalEmbeddingProvider.load()
+        if provider is None:
+            print(f"⚠️ No local embedding model at {LSA_MODEL_FILE}. Fit it with `python -m src.index`.")
+        return provider
+    raise ValueError(f"❌ ERROR: Unknown EMBEDDING_PROVIDER {name!r} (expected 'openai' or 'local')")
+
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embeddings keyed by SHA-256 of (model id, text),
+    so unchanged transcript text is never embedded twice across rebuilds.
+    """
+
+    def __init__(self, db_path=EMBEDDING_CACHE_DB):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id, text):
+        return hashlib.sha256(f"{model_id}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_id, texts):
+        """Return {text: vector} for the texts that are cached."""
+        keys = {self.make_key(model_id, text): text for text in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), 500):  # stay under SQLite's bound-parameter limit
+                batch = key_list[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def set_many(self, model_id, texts, vectors):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(self.make_key(model_id, text), model_id, vector.astype(np.float32).tobytes())
+                 for text, vector in zip(texts, vectors)]
+            )
+            self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """The process-wide EmbeddingCache, or None when EMBEDDING_CACHE_DB is empty."""
+    global _cache
+    if _cache is None and EMBEDDING_CACHE_DB:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def embed_texts(provider, texts, batch_size=None):
+    """Embed many texts in batches, reusing cached vectors and embedding each distinct text once."""
+    cache = get_embedding_cache()
+    unique = list(dict.fromkeys(texts))
+    vectors = cache.get_many(provider.model_id, unique) if cache is not None else {}
+    missing = [text for text in unique if text not in vectors]
+    if len(missing) < len(unique):
+        print(f"💾 {len(unique) - len(missing)}/{len(unique)} embeddings served from cache")
+
+    batch_size = batch_size or provider.batch_size
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        embedded = provider.embed_batch(batch)
+        vectors.update(zip(batch, embedded))
+        if cache is not None:
+            cache.set_many(provider.model_id, batch, embedded)
+        print(f"🧬 Embedded {min(start + batch_size, len(missing))}/{len(missing)} texts with {provider.model_id}")
+
+    return np.array([vectors[text] for text in texts], dtype=np.float32).reshape(len(texts), -1)
+
+
+async def embed_query(provider, text):
+    """Embed a single query. Queries skip the on-disk cache to keep the request path off disk."""
+    return (await provider.aembed_batch([text]))[0]
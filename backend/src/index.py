@@ -0,0 +1,406 @@
+import copy
+import json
+import os
+import sys
+import threading
+import time
+import faiss
+import numpy as np
+from src.corpus import TranscriptCorpus, TRANSCRIPTS_DIR
+from src.embeddings import EMBEDDING_PROVIDER, LocalEmbeddingProvider, create_embedding_provider, embed_texts
+
+# Constants
+INDEX_DIR = "data/index"
+INDEX_FILE = os.path.join(INDEX_DIR, "transcripts.faiss")
+METADATA_FILE = os.path.join(INDEX_DIR, "transcripts_meta.json")
+INDEX_COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", "0.2"))        # compact once this share of rows are tombstones
+INDEX_UPDATE_INTERVAL = float(os.getenv("INDEX_UPDATE_INTERVAL", "300"))    # seconds between background index checks (0 = off)
+
+# Vector storage, chosen per deployment (compare them with `python -m src.index_benchmark`)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")         # "flat" (exact float32), "sq8" (int8, 4x smaller) or "ivfpq"
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))     # IVF cells; 0 = about 4 * sqrt(rows)
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "0"))       # PQ code bytes per vector; 0 = about one per 8 dimensions
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))  # IVF cells scanned per query
+PQ_NBITS = 8  # bits per PQ code, i.e. 256 centroids per sub-quantizer
+TRAINING_POINTS_PER_CENTROID = 39  # what FAISS k-means asks for before it warns about undertrained centroids
+IVFPQ_MIN_ROWS = TRAINING_POINTS_PER_CENTROID * 2 ** PQ_NBITS  # 9984: below this sq8 is used instead
+INDEX_TYPES = ("flat", "sq8", "ivfpq")
+
+
+def resolve_index_type(index_type, rows):
+    """The index type to build for a corpus of `rows` windows (IVF-PQ falls back to sq8 until there's enough data)."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"❌ ERROR: Unknown INDEX_TYPE {index_type!r} (expected one of {', '.join(INDEX_TYPES)})")
+    if index_type == "ivfpq" and rows < IVFPQ_MIN_ROWS:
+        return "sq8"
+    return index_type
+
+
+def pq_subquantizers(dimension):
+    """Smallest divisor of the dimension that gives at least one code byte per 8 dimensions."""
+    for m in range(max(1, dimension // 8), dimension + 1):
+        if dimension % m == 0:
+            return m
+
+
+def make_faiss_index(index_type, vectors, nlist=INDEX_NLIST, pq_m=INDEX_PQ_M, nprobe=INDEX_NPROBE):
+    """An empty id-mapped FAISS index of the given type, trained on `vectors` when the type needs it."""
+    dimension = vectors.shape[1]
+    if index_type == "flat":
+        base = faiss.IndexFlatIP(dimension)  # inner product == cosine on normalized vectors
+    elif index_type == "sq8":
+        base = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "ivfpq":
+        nlist = min(nlist or int(4 * np.sqrt(len(vectors))), max(1, len(vectors) // TRAINING_POINTS_PER_CENTROID))
+        base = faiss.IndexIVFPQ(
+            faiss.IndexFlatIP(dimension), dimension, nlist, pq_m or pq_subquantizers(dimension), PQ_NBITS,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        base.nprobe = nprobe
+    else:
+        raise ValueError(f"❌ ERROR: Unknown index type {index_type!r}")
+
+    if not base.is_trained:
+        base.train(vectors)
+    return faiss.IndexIDMap2(base)
+
+
+class VectorIndex:
+    """
+    A persisted FAISS index of transcript windows and its metadata sidecar.
+
+    Rows are stored under stable ids (IndexIDMap2), so new episodes are appended
+    without touching existing vectors. Rows of removed or re-transcribed episodes
+    are tombstoned and skipped at query time until compacted() drops them.
+    Quantized types (sq8, ivfpq) are trained on the vectors the index is created
+    with; later episodes are encoded with those codebooks until the next rebuild.
+    """
+
+    def __init__(self, index, metadata):
+        self.index = index
+        self.model = metadata["model"]
+        self.index_type = metadata.get("index_type", "flat")
+        self.requested_type = metadata.get("requested_type", self.index_type)  # INDEX_TYPE it was built for
+        self.episodes = metadata.get("episodes", {})  # episode id -> sha256 of the transcript it was embedded from
+        self.entries = {int(row_id): entry for row_id, entry in metadata["entries"].items()}
+        self.tombstones = set(metadata.get("tombstones", []))
+        self.next_id = metadata.get("next_id", max(self.entries, default=-1) + 1)
+        if self.index_type == "ivfpq":
+            # nprobe is saved inside the FAISS file; re-apply the configured one so changing it needs no rebuild
+            faiss.extract_index_ivf(index).nprobe = INDEX_NPROBE
+
+    @classmethod
+    def create(cls, model, vectors, index_type="flat", requested_type=None):
+        """An empty index for `model`, trained on `vectors` if the type needs it."""
+        metadata = {"model": model, "index_type": index_type, "requested_type": requested_type or index_type, "entries": {}}
+        return cls(make_faiss_index(index_type, vectors), metadata)
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE, metadata_file=METADATA_FILE):
+        if not os.path.exists(index_file) or not os.path.exists(metadata_file):
+            return None
+
+        with open(metadata_file, "r") as f:
+            metadata = json.load(f)
+        index = faiss.read_index(index_file)
+
+        if isinstance(metadata["entries"], list):
+            # Sidecar from before incremental updates: give rows ids and re-embed every episode on the next update
+            flat = index
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(flat.d))
+            index.add_with_ids(flat.reconstruct_n(0, flat.ntotal), np.arange(flat.ntotal, dtype=np.int64))
+            metadata["entries"] = dict(enumerate(metadata["entries"]))
+            metadata["episodes"] = {entry["episode"]: None for entry in metadata["entries"].values()}
+        return cls(index, metadata)
+
+    @property
+    def live_rows(self):
+        return self.index.ntotal - len(self.tombstones)
+
+    def tombstone_ratio(self):
+        return len(self.tombstones) / self.index.ntotal if self.index.ntotal else 0.0
+
+    def copy(self):
+        """An independent copy to modify while readers keep using this one."""
+        clone = copy.copy(self)
+        clone.index = faiss.clone_index(self.index)
+        clone.episodes = dict(self.episodes)
+        clone.entries = dict(self.entries)
+        clone.tombstones = set(self.tombstones)
+        return clone
+
+    def add_episode(self, episode_id, sha256, entries, vectors):
+        ids = np.arange(self.next_id, self.next_id + len(entries), dtype=np.int64)
+        self.index.add_with_ids(vectors, ids)
+        self.entries.update(zip(ids.tolist(), entries))
+        self.episodes[episode_id] = sha256
+        self.next_id += len(entries)
+
+    def remove_episode(self, episode_id):
+        self.tombstones.update(row_id for row_id, entry in self.entries.items() if entry["episode"] == episode_id)
+        self.episodes.pop(episode_id, None)
+
+    def compacted(self):
+        """Return a copy with tombstoned rows physically removed (ids of live rows are kept)."""
+        clone = self.copy()
+        if clone.tombstones:
+            clone.index.remove_ids(np.fromiter(clone.tombstones, dtype=np.int64))
+            for row_id in clone.tombstones:
+                clone.entries.pop(row_id, None)
+            clone.tombstones = set()
+        return clone
+
+    def search(self, query_vector, top_k):
+        """Return (entry, score) pairs for the top_k nearest live windows."""
+        k = min(top_k + len(self.tombstones), self.index.ntotal)
+        if k <= 0:
+            return []
+        scores, rows = self.index.search(np.asarray(query_vector, dtype=np.float32).reshape(1, -1), k)
+        hits = [
+            (self.entries[int(row)], float(score))
+            for row, score in zip(rows[0], scores[0])
+            if row >= 0 and int(row) not in self.tombstones
+        ]
+        return hits[:top_k]
+
+    def save(self, index_dir=INDEX_DIR):
+        """
+        Write the index and sidecar via temp files, so a crash never leaves a half-written pair.
+
+        Temp names include the process id, so the API's maintainer and `python -m src.index`
+        never write the same file.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        index_file = os.path.join(index_dir, os.path.basename(INDEX_FILE))
+        metadata_file = os.path.join(index_dir, os.path.basename(METADATA_FILE))
+        suffix = f".{os.getpid()}.tmp"
+
+        faiss.write_index(self.index, index_file + suffix)
+        with open(metadata_file + suffix, "w") as f:
+            json.dump({
+                "model": self.model,
+                "index_type": self.index_type,
+                "requested_type": self.requested_type,
+                "dimension": int(self.index.d),
+                "episodes": self.episodes,
+                "next_id": self.next_id,
+                "tombstones": sorted(self.tombstones),
+                "entries": self.entries,
+            }, f)
+        os.replace(index_file + suffix, index_file)
+        os.replace(metadata_file + suffix, metadata_file)
+
+
+def chunk_entries(episode_id, chunks):
+    """Sidecar entries (one per index row) for an episode's chunks."""
+    return [
+        {
+            "episode": episode_id,
+            "chunk_id": chunk["id"],
+            "start_time": chunk["start_time"],
+            "end_time": chunk["end_time"],
+            "segment_ids": chunk["segment_ids"],
+            "text": chunk["text"],
+        }
+        for chunk in chunks
+    ]
+
+
+def update_index(embedder, corpus, index=None, requested_type=INDEX_TYPE):
+    """
+    Bring a VectorIndex in line with the corpus, embedding only what changed.
+
+    Episodes whose transcript hash differs from the one they were embedded from are
+    tombstoned and re-added; new episodes are appended; removed ones are tombstoned.
+    Returns a new VectorIndex (the one passed in is left untouched for concurrent
+    readers), the same object if nothing changed, or None for an empty corpus.
+    requested_type is resolved against the corpus size (see resolve_index_type).
+    """
+    model = embedder.model_id
+    if index is not None and index.model != model:
+        print(f"⚠️ Index was built with {index.model}, re-embedding everything with {model}")
+        index = None
+
+    index_type = resolve_index_type(requested_type, sum(len(entry["chunks"]) for entry in corpus.entries.values()))
+    if index is not None and index.index_type != index_type:
+        print(f"⚠️ Index is {index.index_type}, rebuilding it as {index_type} (embeddings come from the cache)")
+        index = None
+
+    current = {episode_id: entry["sha256"] for episode_id, entry in corpus.entries.items()}
+    indexed = index.episodes if index is not None else {}
+    stale = [episode_id for episode_id, digest in indexed.items() if current.get(episode_id) != digest]
+    fresh = [episode_id for episode_id, digest in current.items() if indexed.get(episode_id) != digest]
+    if not stale and not fresh:
+        return index
+
+    entries = {episode_id: chunk_entries(episode_id, corpus.entries[episode_id]["chunks"]) for episode_id in fresh}
+    texts = [entry["text"] for episode_id in fresh for entry in entries[episode_id]]
+    vectors = None
+    if texts:
+        print(f"🔄 Embedding {len(texts)} chunks from {len(fresh)} new or changed episode(s) with {model} ...")
+        vectors = embed_texts(embedder, texts)
+
+    if index is None:
+        if vectors is None:
+            return None
+        updated = VectorIndex.create(model, vectors, index_type, requested_type)
+    else:
+        updated = index.copy()
+
+    for episode_id in stale:
+        updated.remove_episode(episode_id)
+        print(f"🪦 Tombstoned episode {episode_id}")
+
+    offset = 0
+    for episode_id in fresh:
+        count = len(entries[episode_id])
+        updated.add_episode(episode_id, current[episode_id], entries[episode_id], vectors[offset:offset + count])
+        offset += count
+        print(f"➕ Indexed episode {episode_id} ({count} chunks)")
+
+    return updated
+
+
+def build_index(client=None, transcripts_dir=TRANSCRIPTS_DIR, index_dir=INDEX_DIR, rebuild=False, provider=EMBEDDING_PROVIDER):
+    """
+    Update the on-disk FAISS index and JSON sidecar from the structured transcripts.
+
+    Only new or changed episodes are embedded unless rebuild is set; the index is
+    compacted when tombstones exceed INDEX_COMPACT_RATIO of its rows. With the local
+    provider, the LSA model is fitted on the transcript chunks first if it doesn't
+    exist yet (or on rebuild). `client` is only needed for the OpenAI provider.
+    """
+    corpus = TranscriptCorpus(transcripts_dir)
+    corpus.refresh()
+
+    texts = [chunk["text"] for entry in corpus.entries.values() for chunk in entry["chunks"]]
+    if not texts:
+        print("❌ ERROR: No transcript chunks to index!")
+        return None
+
+    embedder = None if provider == "local" and rebuild else create_embedding_provider(provider, client=client)
+    if embedder is None:
+        embedder = LocalEmbeddingProvider.fit(texts)
+        embedder.save()
+
+    existing = None
+    if not rebuild:
+        existing = VectorIndex.load(
+            os.path.join(index_dir, os.path.basename(INDEX_FILE)),
+            os.path.join(index_dir, os.path.basename(METADATA_FILE))
+        )
+
+    index = update_index(embedder, corpus, existing)
+
+    if index.tombstone_ratio() > INDEX_COMPACT_RATIO:
+        print(f"🧹 Compacting index ({len(index.tombstones)} tombstoned rows)")
+        index = index.compacted()
+
+    if index is existing:
+        print(f"✅ Index already up to date ({index.live_rows} vectors)")
+        return index
+
+    index.save(index_dir)
+    print(f"✅ Wrote {index.live_rows} vectors to {index_dir}")
+    return index
+
+
+# Loaded once per process on first use; the maintainer reloads it when another process rewrites the files
+_vector_index = None
+_vector_index_loaded = False
+_vector_index_mtime = None  # sidecar mtime of the copy in memory (it is replaced last by save())
+_vector_index_lock = threading.Lock()
+_maintainer = None
+
+def index_files_mtime(metadata_file=METADATA_FILE):
+    return os.path.getmtime(metadata_file) if os.path.exists(metadata_file) else None
+
+def _load_vector_index():
+    global _vector_index, _vector_index_loaded, _vector_index_mtime
+    mtime = index_files_mtime()
+    _vector_index = VectorIndex.load()
+    _vector_index_mtime = mtime
+    _vector_index_loaded = True
+    if _vector_index is None:
+        print("⚠️ No vector index found. Build it with `python -m src.index`.")
+    else:
+        print(f"📦 Loaded {_vector_index.index_type} vector index ({_vector_index.live_rows} windows)")
+
+def load_vector_index():
+    """(Re)load the process-wide VectorIndex from disk and swap it in."""
+    with _vector_index_lock:
+        _load_vector_index()
+    return _vector_index
+
+def get_vector_index():
+    """Return the process-wide VectorIndex, or None if it hasn't been built yet."""
+    if not _vector_index_loaded:
+        with _vector_index_lock:
+            if not _vector_index_loaded:
+                _load_vector_index()
+    return _vector_index
+
+
+def start_index_maintainer(embedder, corpus, interval=INDEX_UPDATE_INTERVAL):
+    """
+    Start a daemon thread that keeps the process-wide vector index current.
+
+    When the corpus changes it embeds the new episodes, and it compacts away
+    tombstones once they pass INDEX_COMPACT_RATIO. Both run on a copy that is
+    swapped in when done, so queries never wait on them. The index itself must
+    have been built once with `python -m src.index`; when that command rewrites the
+    files (e.g. a --rebuild), the maintainer reloads them instead of overwriting them.
+    """
+    global _maintainer
+    if _maintainer is not None or embedder is None or interval <= 0:
+        return
+
+    def maintain():
+        global _vector_index, _vector_index_mtime
+        indexed_fingerprint = None
+        while True:
+            time.sleep(interval)
+            try:
+                index = get_vector_index()
+                if index_files_mtime() != _vector_index_mtime:
+                    index = load_vector_index()
+                    indexed_fingerprint = None
+                    if index is not None and index.model != embedder.model_id:
+                        print(f"⚠️ Reloaded index was built with {index.model}; restart the API to embed queries with it")
+                if index is None:
+                    continue
+
+                updated = index
+                if corpus.fingerprint != indexed_fingerprint and index.model == embedder.model_id:
+                    # Keep the type the index was last built for, even if this process was started with another INDEX_TYPE
+                    updated = update_index(embedder, corpus, index, index.requested_type)
+                    indexed_fingerprint = corpus.fingerprint
+                if updated.tombstone_ratio() > INDEX_COMPACT_RATIO:
+                    started = time.perf_counter()
+                    updated = updated.compacted()
+                    print(f"🧹 Compacted vector index in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+                if updated is not index:
+                    with _vector_index_lock:
+                        if index_files_mtime() != _vector_index_mtime:
+                            continue  # rewritten on disk meanwhile: reload it next time rather than overwrite it
+                        _vector_index = updated
+                        updated.save()
+                        _vector_index_mtime = index_files_mtime()
+                    print(f"📦 Vector index updated ({updated.live_rows} windows)")
+            except Exception as e:
+                print(f"❌ ERROR updating vector index: {e}")
+
+    _maintainer = threading.Thread(target=maintain, name="index-maintainer", daemon=True)
+    _maintainer.start()
+
+
+if __name__ == "__main__":
+    client = None
+    if EMBEDDING_PROVIDER == "openai":
+        from openai import OpenAI
+        from src.search import load_config
+
+        client = OpenAI(api_key=load_config().get("openai_api_key"))
+
+    build_index(client, rebuild="--rebuild" in sys.argv[1:])
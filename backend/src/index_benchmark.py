@@ -0,0 +1,112 @@
+"""
+Compare vector index types on our transcripts: recall, query latency and memory.
+
+    python -m src.index_benchmark [--rows 50000] [--queries 200] [--k 10] [--nprobe 4,16,64]
+
+Windows are embedded with the configured provider (through the embedding cache).
+--rows pads the corpus with random blends of pairs of its windows to approximate
+a multi-year archive. Queries are jittered windows; recall@k is measured against
+exact float32 search. Pick the winner per deployment with INDEX_TYPE.
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from src.corpus import TranscriptCorpus
+from src.embeddings import EMBEDDING_PROVIDER, create_embedding_provider, embed_texts, normalize_rows
+from src.index import make_faiss_index, resolve_index_type
+
+JITTER = 0.05  # noise added to copied windows and queries, relative to a unit vector's per-dimension scale
+
+
+def jitter(vectors, rng):
+    noise = rng.normal(scale=JITTER / np.sqrt(vectors.shape[1]), size=vectors.shape)
+    return normalize_rows(vectors + noise)
+
+
+def blend(vectors, count, rng):
+    """Synthetic windows: normalized random mixes of two real windows, plus jitter."""
+    first, second = rng.integers(len(vectors), size=(2, count))
+    weights = rng.uniform(0.2, 0.8, size=(count, 1)).astype(np.float32)
+    return jitter(weights * vectors[first] + (1 - weights) * vectors[second], rng)
+
+
+def measure(index, queries, k, truth):
+    """Return (recall@k, median query µs, p95 query µs) running one query at a time, like the API does."""
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        _, rows = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        found.append(rows[0])
+
+    recall = np.mean([len(set(rows) & set(expected)) / k for rows, expected in zip(found, truth)])
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def run(vectors, query_count=200, k=10, nprobes=(4, 16, 64), seed=0):
+    rng = np.random.default_rng(seed)
+    queries = jitter(vectors[rng.choice(len(vectors), size=query_count)], rng)
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    print(f"\n{'index':<16}{'build ms':>10}{'MB':>10}{'bytes/vec':>11}{'p50 µs':>10}{'p95 µs':>10}{'recall@' + str(k):>11}")
+    for index_type in ("flat", "sq8", "ivfpq"):
+        if resolve_index_type(index_type, len(vectors)) != index_type:
+            print(f"{index_type:<16}  skipped: needs more windows to train")
+            continue
+
+        started = time.perf_counter()
+        index = make_faiss_index(index_type, vectors)
+        index.add_with_ids(vectors, ids)
+        build_ms = (time.perf_counter() - started) * 1000
+        size = faiss.serialize_index(index).nbytes
+
+        for nprobe in (nprobes if index_type == "ivfpq" else (None,)):
+            label = index_type
+            if nprobe is not None:
+                faiss.extract_index_ivf(index).nprobe = nprobe
+                label = f"ivfpq/nprobe={nprobe}"
+            recall, p50, p95 = measure(index, queries, k, truth)
+            print(
+                f"{label:<16}{build_ms:>10.0f}{size / 1e6:>10.2f}{size / len(vectors):>11.0f}"
+                f"{p50:>10.0f}{p95:>10.0f}{recall:>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=0, help="pad the corpus to this many windows")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,16,64", help="IVF cells to scan, comma-separated")
+    args = parser.parse_args()
+
+    client = None
+    if EMBEDDING_PROVIDER == "openai":
+        from openai import OpenAI
+        from src.search import load_config
+
+        client = OpenAI(api_key=load_config().get("openai_api_key"))
+
+    embedder = create_embedding_provider(client=client)
+    if embedder is None:
+        raise SystemExit(1)
+
+    corpus = TranscriptCorpus()
+    corpus.refresh()
+    texts = [chunk["text"] for entry in corpus.entries.values() for chunk in entry["chunks"]]
+    if not texts:
+        raise SystemExit("❌ ERROR: No transcript chunks to benchmark!")
+    vectors = embed_texts(embedder, texts)
+
+    if args.rows > len(vectors):
+        rng = np.random.default_rng(1)
+        vectors = np.vstack([vectors, blend(vectors, args.rows - len(vectors), rng)])
+    print(f"📊 Benchmarking {len(vectors)} windows ({len(texts)} real) of {vectors.shape[1]} dimensions from {embedder.model_id}")
+
+    run(vectors, args.queries, args.k, tuple(int(n) for n in args.nprobe.split(",")))
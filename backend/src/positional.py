@@ -0,0 +1,122 @@
+import re
+import threading
+import time
+import numpy as np
+from src.corpus import corpus
+
+# Constants
+OFFSET_BITS = 32  # a position is (episode row << OFFSET_BITS) | token offset within the episode
+
+
+def phrase_tokens(text):
+    """Lowercase word tokens for exact matching: stopwords are kept and hyphens dropped ("H-1B" == "H1B")."""
+    return [token.replace("-", "") for token in re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower())]
+
+
+class PositionalIndex:
+    """
+    Positional inverted index over every episode's segments.
+
+    Each token maps to a sorted int64 array of positions, one per occurrence, packing
+    the episode and the token's offset within the whole episode (so phrases that
+    straddle two Whisper segments still match). A phrase query intersects the
+    shifted position arrays of its tokens, then maps matches back to segments.
+    """
+
+    def __init__(self, entries, version):
+        self.version = version
+        self.episodes = list(entries)      # episode row -> episode id
+        self.segment_starts = []           # episode row -> token offset where each segment begins
+        self.segments = []                 # episode row -> segment list
+        positions = {}
+
+        for row, (episode_id, entry) in enumerate(entries.items()):
+            offset = 0
+            starts = []
+            for segment in entry["segments"]:
+                starts.append(offset)
+                for token in phrase_tokens(segment["text"]):
+                    positions.setdefault(token, []).append((row << OFFSET_BITS) | offset)
+                    offset += 1
+            self.segment_starts.append(np.array(starts, dtype=np.int64))
+            self.segments.append(entry["segments"])
+
+        # Offsets only grow within an episode and episodes are visited in row order, so these are already sorted
+        self.postings = {token: np.array(found, dtype=np.int64) for token, found in positions.items()}
+
+    def positions(self, phrase):
+        """Positions of the phrase's first token wherever the whole phrase occurs."""
+        tokens = phrase_tokens(phrase)
+        if not tokens or any(token not in self.postings for token in tokens):
+            return np.empty(0, dtype=np.int64)
+
+        # Start from the rarest token so every intersection is as small as possible
+        pivot = min(range(len(tokens)), key=lambda i: len(self.postings[tokens[i]]))
+        matches = self.postings[tokens[pivot]] - pivot
+        for i, token in enumerate(tokens):
+            if i != pivot and len(matches):
+                matches = np.intersect1d(matches, self.postings[token] - i, assume_unique=True)
+        return matches
+
+    def lookup(self, phrase, limit=None):
+        """
+        Exact occurrences of a phrase, in corpus order (newest episode first).
+
+        Returns [{"episode", "segment_id", "offset", "start_time", "text"}], at most limit of them.
+        """
+        matches = self.positions(phrase)
+        if limit is not None:
+            matches = matches[:limit]
+
+        hits = []
+        for position in matches.tolist():
+            row, offset = position >> OFFSET_BITS, position & ((1 << OFFSET_BITS) - 1)
+            segment_id = int(np.searchsorted(self.segment_starts[row], offset, side="right")) - 1
+            segment = self.segments[row][segment_id]
+            hits.append({
+                "episode": self.episodes[row],
+                "segment_id": segment_id,
+                "offset": offset,
+                "start_time": segment["start_time"],
+                "text": segment["text"].strip(),
+            })
+        return hits
+
+    def count(self, phrase):
+        return len(self.positions(phrase))
+
+
+# Rebuilt by the corpus watcher when the corpus changes
+_positional_index = None
+_positional_index_lock = threading.Lock()
+
+def rebuild_positional_index():
+    """Build the index for the current corpus and swap it in; readers keep using the old one until then."""
+    global _positional_index
+    with _positional_index_lock:
+        version = corpus.version
+        if _positional_index is None or _positional_index.version != version:
+            started = time.perf_counter()
+            _positional_index = PositionalIndex(corpus.entries, version)
+            print(
+                f"🔤 Built positional index: {len(_positional_index.postings)} tokens, "
+                f"{len(_positional_index.episodes)} episode(s) in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+    return _positional_index
+
+def get_positional_index():
+    """
+    Return the current PositionalIndex.
+
+    Built on first use (the API builds it at startup); after that only the corpus
+    watcher rebuilds it, so the locator never waits for a rebuild.
+    """
+    if not corpus.loaded:
+        corpus.refresh()
+    return _positional_index if _positional_index is not None else rebuild_positional_index()
+
+def _refresh_positional_index():
+    if _positional_index is not None:  # only keep an index current once something has used it
+        rebuild_positional_index()
+
+corpus.on_change(_refresh_positional_index)
@@ -1,14 +1,56 @@
 import yaml
 import openai
-import json
+import bisect
 import os
+import re
+import threading
+import time
+import numpy as np
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from difflib import SequenceMatcher
 import difflib
+from src.chunker import count_tokens, segment_end_time
+from src.corpus import corpus
+from src.embeddings import create_embedding_provider
+from src.index import get_vector_index
+from src.positional import get_positional_index, phrase_tokens
 
-# Constants
-TRANSCRIPT_FILE = "data/structured_transcripts/march_11.json"
-VIDEO_URL = "https://www.facebook.com/rnlawgroupUS/videos/498204740023527/"
+DEFAULT_VIDEO_DURATION = 3600  # used when the registry doesn't list an episode's duration
+
+# Retrieval settings (override with environment variables)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))                   # windows sent to the model
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1500"))  # max transcript tokens per prompt
+RETRIEVAL_CANDIDATES = 50  # windows each retriever contributes to the fusion
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"  # fuse BM25 with the vector index when it's built
+RRF_K = int(os.getenv("RRF_K", "60"))  # reciprocal rank fusion damping: score = sum of 1 / (RRF_K + rank)
+BM25_K1 = 1.2   # term frequency saturation
+BM25_B = 0.75   # document length normalization
+
+# Prompt serialization settings
+LINE_TOKEN_LIMIT = 60  # adjacent segments are merged into one "[t] text" line up to this size
+LLM_TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("LLM_TRANSCRIPT_TOKEN_BUDGET", "16000"))  # timestamp fallback prompt
+
+# Local timestamp locator settings
+LOCATOR_MIN_CONFIDENCE = float(os.getenv("LOCATOR_MIN_CONFIDENCE", "0.15"))  # cosine score needed to skip the LLM
+LOCATOR_LLM_FALLBACK = os.getenv("LOCATOR_LLM_FALLBACK", "1") == "1"         # ask GPT-4o when local confidence is low
+LOCATOR_ANSWER_WEIGHT = 0.4  # how much the generated answer counts next to the user's question
+LOCATOR_EXACT_BONUS = 0.2    # added to chunks/segments containing an exact query phrase
+LOCATOR_EXACT_MAX_HITS = 20  # phrases found more often than this are too common to point anywhere
+
+# "sequential": locate the timestamp after the answer arrives (uses the answer text).
+# "parallel": locate it from the query + retrieved passages while the answer is generated.
+TIMESTAMP_MODE = os.getenv("TIMESTAMP_MODE", "sequential")
+TIMESTAMP_REFINE = os.getenv("TIMESTAMP_REFINE", "1") == "1"  # in parallel mode, re-check locally once the answer is in
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from",
+    "has", "have", "how", "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "so",
+    "that", "the", "their", "there", "they", "this", "to", "was", "we", "what", "when", "where",
+    "which", "who", "will", "with", "you", "your",
+}
 
 # Load API Key
 def load_config():
@@ -29,36 +71,679 @@ api_key = config.get("openai_api_key", None)
 
 client = OpenAI(api_key=api_key)
 
-def load_structured_transcript():
-    """Load the structured transcript with timestamps."""
-    if not os.path.exists(TRANSCRIPT_FILE):
+def ensure_corpus_loaded():
+    if not corpus.loaded:
+        corpus.refresh()  # Not warmed up by the API (e.g. running as a script)
+
+def load_structured_transcript(episode_id=None):
+    """Load the structured transcript with timestamps (latest episode by default)."""
+    _, transcript_data = get_full_transcript(episode_id)
+    return transcript_data
+
+def get_full_transcript(episode_id=None):
+    """Load both the full transcript text and the structured transcript of an episode from the corpus cache."""
+    ensure_corpus_loaded()
+    entry = corpus.get(episode_id) if episode_id else corpus.latest()
+    if entry is None:
+        return "", []  # Return an empty transcript and an empty list if the episode doesn't exist
+
+    return entry["full_text"], entry["segments"]
+
+def get_episode(episode_id):
+    """Registry details (id, date, video_url, duration...) for an episode, or None."""
+    entry = corpus.get(episode_id)
+    return entry["episode"] if entry else None
+
+def clamp_timestamp(seconds, episode_id):
+    """Back off a couple of seconds for context and keep the timestamp inside the episode's video."""
+    episode = get_episode(episode_id) or {}
+    duration = episode.get("duration") or DEFAULT_VIDEO_DURATION
+    return max(0, min(int(seconds) - 2, duration))
+
+# Per-episode lookup arrays, rebuilt only when the episode's transcript changes
+_timelines = {}
+
+def get_timeline(episode_id):
+    """
+    Sorted segment start times and cumulative character offsets (into the episode's
+    newline-joined full text) for an episode, or None if it isn't loaded.
+    """
+    entry = corpus.get(episode_id)
+    if entry is None:
+        return None
+    timeline = _timelines.get(episode_id)
+    if timeline is not None and timeline["sha256"] == entry["sha256"]:
+        return timeline
+
+    segments = entry["segments"]
+    order = sorted(range(len(segments)), key=lambda i: segments[i]["start_time"])
+    offsets = []
+    offset = 0
+    for segment in segments:
+        offsets.append(offset)
+        offset += len(segment["text"]) + 1  # the "\n" joining segments in full_text
+    timeline = {
+        "sha256": entry["sha256"],
+        "order": order,
+        "start_times": [segments[i]["start_time"] for i in order],
+        "end_time": max((segment_end_time(segments, i) for i in range(len(segments))), default=0.0),
+        "offsets": offsets,
+        "length": max(offset - 1, 0),  # len(full_text)
+    }
+    for removed in [key for key in _timelines if key not in corpus.entries]:
+        _timelines.pop(removed, None)
+    _timelines[episode_id] = timeline
+    return timeline
+
+def describe_segment(episode_id, segment_id):
+    segments = corpus.get(episode_id)["segments"]
+    return {
+        "episode": episode_id,
+        "segment_id": segment_id,
+        "start_time": segments[segment_id]["start_time"],
+        "end_time": segment_end_time(segments, segment_id),
+        "text": segments[segment_id]["text"].strip(),
+    }
+
+def segment_at_time(episode_id, seconds):
+    """
+    The segment being spoken at `seconds` into the episode (the last one starting at or
+    before it), or None if the episode isn't loaded or `seconds` is past its end.
+    """
+    timeline = get_timeline(episode_id)
+    if not timeline or not timeline["order"]:
+        return None
+    duration = (get_episode(episode_id) or {}).get("duration")
+    if seconds > timeline["end_time"] or (duration and seconds > duration):
+        return None
+    position = max(bisect.bisect_right(timeline["start_times"], seconds) - 1, 0)
+    return describe_segment(episode_id, timeline["order"][position])
+
+def segment_at_offset(episode_id, offset):
+    """The segment containing character `offset` of the episode's full text, or None."""
+    timeline = get_timeline(episode_id)
+    if not timeline or not 0 <= offset < timeline["length"]:
+        return None
+    return describe_segment(episode_id, bisect.bisect_right(timeline["offsets"], offset) - 1)
+
+def time_at_offset(episode_id, offset):
+    """Start time (seconds) of the segment containing character `offset` of the episode's full text, or None."""
+    segment = segment_at_offset(episode_id, offset)
+    return segment["start_time"] if segment else None
+
+def parse_timecode(value):
+    """Seconds from "750", "750.5", "12:30" or "1:02:03"; raises ValueError for anything else."""
+    parts = value.strip().split(":")
+    if len(parts) > 3 or any(not part.replace(".", "", 1).isdigit() for part in parts):
+        raise ValueError(f"Invalid time {value!r}: use seconds, MM:SS or H:MM:SS")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def tokenize(text):
+    """Lowercase word tokens, keeping hyphenated legal terms like "h-1b" or "i-140" intact."""
+    tokens = re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower())
+    return [token for token in tokens if token not in STOPWORDS]
+
+def expand_terms(tokens):
+    """BM25 terms: hyphenated tokens also count in their joined form, so "H-1B" matches "H1B" and vice versa."""
+    for token in tokens:
+        yield token
+        if "-" in token:
+            yield token.replace("-", "")
+
+def format_line(start_time, text):
+    """Compact prompt line: "[115.76] text", with the start time in seconds."""
+    return f"[{float(start_time):g}] {text.strip()}"
+
+def serialize_segments(segments, token_budget=LLM_TRANSCRIPT_TOKEN_BUDGET, line_token_limit=LINE_TOKEN_LIMIT):
+    """
+    Render segments as compact "[t] text" lines for a prompt.
+
+    Adjacent segments are merged into one line (keeping the first start time) until a
+    line reaches line_token_limit tokens, and lines stop being added once the next one
+    would exceed token_budget. Returns (text, token_count).
+    """
+    lines = []
+    used_tokens = 0
+    line_start, line_texts, line_tokens = None, [], 0
+
+    def flush():
+        nonlocal used_tokens
+        if not line_texts:
+            return True
+        line = format_line(line_start, " ".join(line_texts))
+        tokens = count_tokens(line) + 1  # + newline
+        if used_tokens + tokens > token_budget:
+            return False
+        lines.append(line)
+        used_tokens += tokens
+        return True
+
+    for segment in segments:
+        text = segment["text"].strip()
+        tokens = count_tokens(text)
+        if line_texts and line_tokens + tokens > line_token_limit:
+            if not flush():
+                break
+            line_texts, line_tokens = [], 0
+        if not line_texts:
+            line_start = segment["start_time"]
+        line_texts.append(text)
+        line_tokens += tokens
+    else:
+        flush()
+
+    return "\n".join(lines), used_tokens
+
+def segment_window(segments, center_time, token_budget=LLM_TRANSCRIPT_TOKEN_BUDGET):
+    """
+    (first, stop) indices of the segments around center_time that fit token_budget.
+
+    Grows outward from the segment at center_time, one segment at a time on whichever
+    side is shorter so far, counting each segment as its own line (an upper bound of
+    what serialize_segments will use after merging lines).
+    """
+    costs = [count_tokens(format_line(segment["start_time"], segment["text"])) + 1 for segment in segments]
+    center = max(bisect.bisect_right([segment["start_time"] for segment in segments], center_time) - 1, 0)
+    first, stop = center, center + 1
+    used = costs[center] if segments else 0
+    while first > 0 or stop < len(segments):
+        before = segments[center]["start_time"] - segments[first]["start_time"]
+        after = segments[stop - 1]["start_time"] - segments[center]["start_time"]
+        if first > 0 and (stop >= len(segments) or before <= after):
+            if used + costs[first - 1] > token_budget:
+                break
+            first -= 1
+            used += costs[first]
+        else:
+            if used + costs[stop] > token_budget:
+                break
+            used += costs[stop]
+            stop += 1
+    return first, stop
+
+# Sparse TF-IDF index over every episode's chunks, rebuilt by the corpus watcher when the corpus changes
+_lexical_index = None
+_lexical_index_lock = threading.Lock()
+
+def group_postings(terms, term_ids, rows, weights):
+    """COO (term id, row, weight) arrays -> {term: (rows, weights)}, each a view into one sorted array."""
+    order = np.argsort(term_ids, kind="stable")  # stable: rows stay ascending within a term
+    rows, weights = rows[order], weights[order]
+    ends = np.cumsum(np.bincount(term_ids, minlength=len(terms)))
+    starts = ends - np.bincount(term_ids, minlength=len(terms))
+    return {
+        term: (rows[start:end], weights[start:end])
+        for term, start, end in zip(terms, starts.tolist(), ends.tolist()) if end > start
+    }
+
+def build_lexical_index(entries, version):
+    """
+    Build the corpus-wide TF-IDF and BM25 index over transcript chunks.
+
+    Stored as per-term postings (chunk rows + normalized weights) rather than a dense
+    matrix, so memory grows with the amount of text, not episodes x vocabulary. Chunks
+    are tokenized one at a time into flat (term id, row, count) arrays; the weights are
+    then computed for all postings at once with NumPy.
+    """
+    started = time.perf_counter()
+    chunks = []  # (episode id, chunk) per row
+    vocabulary = {}  # term -> id, shared by the TF-IDF and BM25 postings
+    tfidf_terms, tfidf_rows, tfidf_counts = array("i"), array("i"), array("f")
+    bm25_terms, bm25_rows, bm25_counts = array("i"), array("i"), array("f")
+    segment_rows = {}  # (episode id, segment id) -> rows of the chunks containing it
+
+    for episode_id, entry in entries.items():
+        for chunk in entry["chunks"]:
+            row = len(chunks)
+            chunks.append((episode_id, chunk))
+            terms = Counter(tokenize(chunk["text"]))
+            for term, count in terms.items():
+                tfidf_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                tfidf_rows.append(row)
+                tfidf_counts.append(count)
+            for term, count in Counter(expand_terms(terms.elements())).items():
+                bm25_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                bm25_rows.append(row)
+                bm25_counts.append(count)
+            for segment_id in chunk["segment_ids"]:
+                segment_rows.setdefault((episode_id, segment_id), []).append(row)
+
+    terms = list(vocabulary)
+    term_count = len(terms)
+    tfidf_terms, tfidf_rows, tfidf_counts, bm25_terms, bm25_rows, bm25_counts = (
+        np.frombuffer(values, dtype=values.typecode)
+        for values in (tfidf_terms, tfidf_rows, tfidf_counts, bm25_terms, bm25_rows, bm25_counts)
+    )
+
+    # TF-IDF: smoothed idf, rows L2-normalized
+    document_frequency = np.bincount(tfidf_terms, minlength=term_count)
+    idf_values = np.log((1 + len(chunks)) / (1 + document_frequency)) + 1
+    weights = tfidf_counts * idf_values[tfidf_terms]
+    norms = np.sqrt(np.bincount(tfidf_rows, weights=weights * weights, minlength=len(chunks)))
+    norms[norms == 0] = 1.0
+    weights = (weights / norms[tfidf_rows]).astype(np.float32)
+    idf = {terms[term]: float(idf_values[term]) for term in np.flatnonzero(document_frequency).tolist()}
+
+    # BM25 term weights are fixed per (term, chunk), so they're precomputed and a query is one sparse sum
+    bm25_document_frequency = np.bincount(bm25_terms, minlength=term_count)
+    lengths = np.bincount(bm25_rows, weights=bm25_counts, minlength=len(chunks))
+    average_length = lengths.mean() if len(chunks) else 1.0
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+    df = bm25_document_frequency[bm25_terms]
+    bm25_weights = (
+        np.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+        * bm25_counts * (BM25_K1 + 1) / (bm25_counts + length_norm[bm25_rows])
+    ).astype(np.float32)
+
+    index = {
+        "version": version,
+        "idf": idf,
+        "chunks": chunks,
+        "segments": {episode_id: entry["segments"] for episode_id, entry in entries.items()},  # as chunked
+        "rows": {(episode_id, chunk["id"]): row for row, (episode_id, chunk) in enumerate(chunks)},
+        "segment_rows": segment_rows,
+        "postings": group_postings(terms, tfidf_terms, tfidf_rows, weights),
+        "bm25": group_postings(terms, bm25_terms, bm25_rows, bm25_weights),
+    }
+    print(
+        f"🗂️ Built lexical index: {len(chunks)} chunks, {len(idf)} terms, {len(entries)} episode(s) "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return index
+
+def rebuild_lexical_index():
+    """Build the index for the current corpus and swap it in; readers keep using the old one until then."""
+    global _lexical_index
+    with _lexical_index_lock:
+        version = corpus.version
+        if _lexical_index is None or _lexical_index["version"] != version:
+            _lexical_index = build_lexical_index(corpus.entries, version)
+    return _lexical_index
+
+def get_lexical_index():
+    """
+    Return the current lexical index.
+
+    It is built on first use (the API builds it at startup) and afterwards only by
+    the corpus watcher thread, so a request never waits for a rebuild: until the
+    new index is swapped in, queries use the previous one.
+    """
+    ensure_corpus_loaded()
+    return _lexical_index if _lexical_index is not None else rebuild_lexical_index()
+
+def _refresh_lexical_index():
+    if _lexical_index is not None:  # only keep an index current once something has used it
+        rebuild_lexical_index()
+
+corpus.on_change(_refresh_lexical_index)
+
+def weigh_terms(index, text):
+    """L2-normalized TF-IDF weights of the text's known terms, as {term: weight}."""
+    counts = Counter(token for token in tokenize(text) if token in index["idf"])
+    weights = {term: count * index["idf"][term] for term, count in counts.items()}
+    norm = np.sqrt(sum(weight * weight for weight in weights.values()))
+    return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+def score_chunks(index, term_weights):
+    """Cosine similarity of every chunk to the given term weights."""
+    scores = np.zeros(len(index["chunks"]), dtype=np.float32)
+    for term, weight in term_weights.items():
+        rows, chunk_weights = index["postings"][term]
+        scores[rows] += weight * chunk_weights
+    return scores
+
+def top_rows(scores, limit):
+    """Rows with a positive score, best first, at most limit of them."""
+    if len(scores) > limit:
+        candidates = np.argpartition(-scores, limit)[:limit]
+    else:
+        candidates = np.arange(len(scores))
+    candidates = candidates[scores[candidates] > 0]
+    return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+def bm25_search(index, query, limit=RETRIEVAL_CANDIDATES):
+    """Return (rows best first, {row: BM25 score}, elapsed ms) for the query's terms."""
+    started = time.perf_counter()
+    scores = np.zeros(len(index["chunks"]), dtype=np.float32)
+    for term, count in Counter(expand_terms(tokenize(query))).items():
+        if term in index["bm25"]:
+            rows, weights = index["bm25"][term]
+            scores[rows] += count * weights
+    rows = top_rows(scores, limit)
+    return rows, {row: float(scores[row]) for row in rows}, (time.perf_counter() - started) * 1000
+
+def vector_search(index, query_vector, limit=RETRIEVAL_CANDIDATES):
+    """
+    Return (rows best first, {row: cosine score}, elapsed ms) from the FAISS index, as lexical index rows.
+    query_vector must come from the embedding model the index was built with.
+
+    Hits from episodes whose transcript changed since they were embedded are skipped,
+    since their chunk ids may no longer line up.
+    """
+    started = time.perf_counter()
+    vector_index = get_vector_index()
+    if query_vector is None or vector_index is None:
+        return [], {}, 0.0
+
+    rows, scores = [], {}
+    for entry, score in vector_index.search(query_vector, limit):
+        episode_id = entry["episode"]
+        corpus_entry = corpus.get(episode_id)
+        if corpus_entry is None or vector_index.episodes.get(episode_id) != corpus_entry["sha256"]:
+            continue
+        row = index["rows"].get((episode_id, entry["chunk_id"]))
+        if row is not None and row not in scores:
+            rows.append(row)
+            scores[row] = score
+    return rows, scores, (time.perf_counter() - started) * 1000
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse best-first row lists: each row scores the sum of 1 / (k + rank) over the lists it appears in."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] += 1.0 / (k + rank)
+    return [row for row, _ in fused.most_common()], fused
+
+# BM25 runs on the request thread while the vector search runs here (FAISS releases the GIL)
+_retrieval_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+
+def hybrid_search(index, query, query_vector=None, limit=RETRIEVAL_CANDIDATES):
+    """
+    Rank lexical index rows with BM25 and the vector index in parallel and fuse them with RRF.
+
+    Falls back to BM25 alone without a query vector or vector index. Returns
+    (rows best first, {row: fused score}, timings in ms).
+    """
+    vector_future = None
+    if HYBRID_RETRIEVAL and query_vector is not None:
+        vector_future = _retrieval_pool.submit(vector_search, index, query_vector, limit)
+
+    bm25_rows, bm25_scores, bm25_ms = bm25_search(index, query, limit)
+    vector_rows, vector_ms = [], 0.0
+    if vector_future is not None:
+        vector_rows, _, vector_ms = vector_future.result()
+
+    started = time.perf_counter()
+    if vector_rows:
+        ranked, scores = reciprocal_rank_fusion([bm25_rows, vector_rows])
+    else:
+        ranked, scores = bm25_rows, bm25_scores
+    timings = {
+        "bm25_ms": round(bm25_ms, 2),
+        "vector_ms": round(vector_ms, 2),
+        "fuse_ms": round((time.perf_counter() - started) * 1000, 2),
+        "bm25_hits": len(bm25_rows),
+        "vector_hits": len(vector_rows),
+    }
+    return ranked, scores, timings
+
+def retrieve_context(query, top_k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET, query_vector=None):
+    """
+    Rank transcript chunks from every episode against the query and build a prompt context.
+
+    Chunks are ranked by hybrid BM25 + vector retrieval (see hybrid_search) when a
+    query embedding is passed in, otherwise by BM25 alone.
+    Returns (context_text, passages, timings) where passages are the selected chunks
+    grouped by episode in transcript order and timings holds per-stage durations in milliseconds.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    index = get_lexical_index()
+    timings["index_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    ranked, scores, search_timings = hybrid_search(index, query, query_vector)
+    timings.update(search_timings)
+    timings["score_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Take the best chunks that fit the token budget, skipping ones that overlap a pick
+    started = time.perf_counter()
+    passages = []
+    covered = set()
+    used_tokens = 0
+    for i in ranked:
+        if len(passages) >= top_k:
+            break
+        episode_id, chunk = index["chunks"][i]
+        segment_keys = {(episode_id, segment_id) for segment_id in chunk["segment_ids"]}
+        if covered & segment_keys:
+            continue
+        if used_tokens + chunk["tokens"] > token_budget:
+            continue
+        covered |= segment_keys
+        used_tokens += chunk["tokens"]
+        passages.append({
+            "episode_id": episode_id,
+            "chunk_id": chunk["id"],
+            "start_time": chunk["start_time"],
+            "end_time": chunk["end_time"],
+            "text": chunk["text"],
+            "score": float(scores[i]),
+            "segment_ids": chunk["segment_ids"],
+        })
+
+    passages.sort(key=lambda passage: (passage["episode_id"], passage["start_time"]))
+    lines = []
+    for passage in passages:
+        if not lines or lines[-1][0] != passage["episode_id"]:
+            episode = get_episode(passage["episode_id"]) or {}
+            lines.append((passage["episode_id"], f"Episode {passage['episode_id']} ({episode.get('date') or 'undated'}):"))
+        lines.append((passage["episode_id"], format_line(passage["start_time"], passage["text"])))
+    context_text = "\n".join(line for _, line in lines)
+    timings["select_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    timings["context_tokens"] = used_tokens
+
+    return context_text, passages, timings
+
+def format_segment_context(passages):
+    """Render retrieved passages one segment per line as "[#episode/id] text" so the model can cite segments."""
+    lines = []
+    for passage in passages:
+        segments = corpus.get(passage["episode_id"])["segments"]
+        for segment_id in passage["segment_ids"]:
+            lines.append(f"[#{passage['episode_id']}/{segment_id}] {segments[segment_id]['text'].strip()}")
+    return "\n".join(lines)
+
+def resolve_segment_timestamp(segment_refs):
+    """
+    Turn the first valid "episode/segment" reference cited by the model into
+    (timestamp in seconds, episode id), or None if none are valid.
+    """
+    for ref in segment_refs or []:
+        episode_id, _, segment_id = str(ref).lstrip("#").rpartition("/")
+        entry = corpus.get(episode_id)
+        if entry is None or not segment_id.isdigit() or int(segment_id) >= len(entry["segments"]):
+            continue
+        start_time = entry["segments"][int(segment_id)]["start_time"]
+        print(f"🎯 Timestamp from cited segment {ref}: {start_time}s")
+        return clamp_timestamp(start_time, episode_id), episode_id
+    return None
+
+_search_embedder = None
+
+def search_transcript(query, top_k=5):
+    """
+    Semantic search over the prebuilt FAISS index of transcript windows.
+
+    Returns up to top_k results (best first) with the chunk's `timestamp` and
+    `end_timestamp` (seconds),
+    its transcript text as `answer`, the `episode`, `score` and `video_link`.
+    """
+    global _search_embedder
+    index = get_vector_index()
+    if index is None:
+        return []
+
+    if _search_embedder is None:
+        _search_embedder = create_embedding_provider(client=client)
+    if _search_embedder is None or _search_embedder.model_id != index.model:
+        print(f"⚠️ Vector index was built with {index.model}, which the configured embedding provider doesn't match.")
         return []
 
-    with open(TRANSCRIPT_FILE, "r") as f:
-        return json.load(f)
+    ensure_corpus_loaded()
+    started = time.perf_counter()
+    query_vector = _search_embedder.embed_batch([query])[0]
+    embedded = time.perf_counter()
+    hits = index.search(query_vector, top_k)
+    print(f"🔎 Vector search: embed {(embedded - started) * 1000:.1f}ms, search {(time.perf_counter() - embedded) * 1000:.2f}ms")
+
+    return [
+        {
+            "timestamp": entry["start_time"],
+            "end_timestamp": entry["end_time"],
+            "answer": entry["text"],
+            "episode": entry["episode"],
+            "score": score,
+            "video_link": (get_episode(entry["episode"]) or {}).get("video_url"),
+        }
+        for entry, score in hits
+    ]
+
+def get_most_relevant_timestamp(results):
+    """Pick the best search result's (timestamp in whole seconds, video link), or (None, None)."""
+    if not results:
+        return None, None
+
+    best = max(results, key=lambda result: result["score"])
+    return int(best["timestamp"]), best["video_link"]
+
+def query_phrases(query):
+    """
+    Candidate exact phrases in a query: adjacent pairs of content words ("public charge")
+    and single tokens containing a digit, i.e. form and visa names ("i-140", "eb-5").
+    """
+    tokens = phrase_tokens(query)
+    content = [token not in STOPWORDS for token in tokens]
+    phrases = [f"{tokens[i]} {tokens[i + 1]}" for i in range(len(tokens) - 1) if content[i] and content[i + 1]]
+    phrases += [token for token in tokens if any(char.isdigit() for char in token)]
+    return list(dict.fromkeys(phrases))
+
+def exact_match_segments(query):
+    """(episode id, segment id) pairs where a distinctive query phrase occurs verbatim."""
+    index = get_positional_index()
+    segments = set()
+    for phrase in query_phrases(query):
+        hits = index.lookup(phrase, limit=LOCATOR_EXACT_MAX_HITS + 1)
+        if 0 < len(hits) <= LOCATOR_EXACT_MAX_HITS:
+            segments.update((hit["episode"], hit["segment_id"]) for hit in hits)
+    return segments
+
+def locate_timestamp(query, chatbot_response):
+    """
+    Locally find the segment, in any episode, that best matches the query and the generated answer.
+
+    Scores every chunk against a blend of the query and answer TF-IDF weights, with a
+    bonus for chunks where a distinctive query phrase occurs verbatim (positional
+    index), then picks the strongest segment inside the best chunk.
+    Returns (episode_id, start_time_ms, confidence), or (None, None, 0.0) for an empty corpus.
+    """
+    index = get_lexical_index()
+    if not index["chunks"]:
+        return None, None, 0.0
+
+    target = Counter()
+    for term, weight in weigh_terms(index, query).items():
+        target[term] += (1 - LOCATOR_ANSWER_WEIGHT) * weight
+    for term, weight in weigh_terms(index, chatbot_response or "").items():
+        target[term] += LOCATOR_ANSWER_WEIGHT * weight
 
-def get_full_transcript():
-    """Load both the full transcript text and the structured transcript."""
-    if not os.path.exists(TRANSCRIPT_FILE):
-        return "", []  # Return an empty transcript and an empty list if file doesn't exist
+    chunk_scores = score_chunks(index, target)
+    exact = exact_match_segments(query)
+    exact_rows = {row for key in exact for row in index["segment_rows"].get(key, ())}
+    chunk_scores[list(exact_rows)] += LOCATOR_EXACT_BONUS
+    best_chunk = int(np.argmax(chunk_scores))
+    confidence = float(chunk_scores[best_chunk])
+    episode_id, chunk = index["chunks"][best_chunk]
 
-    with open(TRANSCRIPT_FILE, "r") as f:
-        transcript_data = json.load(f)
+    # Within the chunk, prefer the segment that shares the most weighted terms with the target
+    segments = index["segments"][episode_id]
+    best_segment, best_score = chunk["segment_ids"][0], 0.0
+    for segment_id in chunk["segment_ids"]:
+        segment_score = sum(target.get(term, 0.0) * weight for term, weight in weigh_terms(index, segments[segment_id]["text"]).items())
+        if (episode_id, segment_id) in exact:
+            segment_score += LOCATOR_EXACT_BONUS
+        if segment_score > best_score:
+            best_segment, best_score = segment_id, segment_score
 
-    full_text = "\n".join([segment["text"] for segment in transcript_data])
-    
-    return full_text, transcript_data
+    start_time_ms = int(round(segments[best_segment]["start_time"] * 1000))
+    return episode_id, start_time_ms, confidence
 
-def find_best_video_segment(query, chatbot_response, full_transcript_text, structured_transcript, video_duration):
+async def find_best_video_segment(query, chatbot_response, llm_client, context_is_transcript=False):
     """
-    Find the best timestamp in the video by analyzing:
+    Find the best (timestamp in seconds, episode id) for the answer.
+
+    Uses the local locator first and only falls back to asking GPT-4o (through the
+    given AsyncOpenAI client) when the local match is weak and LOCATOR_LLM_FALLBACK is enabled.
+    With context_is_transcript, chatbot_response holds retrieved transcript passages
+    instead of an answer (parallel mode, before the answer exists).
+    """
+    episode_id, start_time_ms, confidence = locate_timestamp(query, chatbot_response)
+    print(f"📍 Local timestamp: {episode_id} @ {start_time_ms}ms (confidence {confidence:.2f})")
+
+    if episode_id is None:
+        return None, None
+
+    if confidence >= LOCATOR_MIN_CONFIDENCE or not LOCATOR_LLM_FALLBACK:
+        return clamp_timestamp(start_time_ms / 1000, episode_id), episode_id
+
+    print("⚠️ Low local confidence, asking OpenAI for the timestamp...")
+    timestamp = await find_timestamp_with_llm(
+        query, chatbot_response, episode_id, llm_client, start_time_ms / 1000, context_is_transcript
+    )
+    return timestamp, episode_id
+
+def refine_timestamp(query, chatbot_response):
+    """
+    Re-locate the timestamp locally once the answer is known (no network call).
+    Returns (seconds, episode id), or None when the local match isn't confident enough to override.
+    """
+    episode_id, start_time_ms, confidence = locate_timestamp(query, chatbot_response)
+    if episode_id is None or confidence < LOCATOR_MIN_CONFIDENCE:
+        return None
+
+    print(f"🎯 Refined timestamp with answer: {episode_id} @ {start_time_ms}ms (confidence {confidence:.2f})")
+    return clamp_timestamp(start_time_ms / 1000, episode_id), episode_id
+
+async def find_timestamp_with_llm(query, chatbot_response, episode_id, llm_client, around_time=None, context_is_transcript=False):
+    """
+    Find the best timestamp in an episode's video by analyzing:
     - The user's query.
     - The chatbot's response (AI-generated summary).
-    - The full podcast transcript.
-    - The structured transcript with timestamps.
+    - The episode's structured transcript with timestamps.
+
+    An episode longer than LLM_TRANSCRIPT_TOKEN_BUDGET is cut to the stretch of
+    transcript centred on around_time (the local locator's best guess), rather
+    than to its beginning. With context_is_transcript, chatbot_response is retrieved
+    transcript text rather than an answer, and the prompt says so.
     """
 
     # 🔹 Step 1: AI Determines the **Exact** Position in the Transcript
+    structured_transcript = corpus.get(episode_id)["segments"]
+    video_duration = (get_episode(episode_id) or {}).get("duration") or DEFAULT_VIDEO_DURATION
+    transcript_text, transcript_tokens = serialize_segments(structured_transcript, token_budget=float("inf"))
+    if transcript_tokens > LLM_TRANSCRIPT_TOKEN_BUDGET:
+        first, stop = segment_window(structured_transcript, around_time or 0.0)
+        transcript_text, transcript_tokens = serialize_segments(structured_transcript[first:stop])
+    if context_is_transcript:
+        evidence = (
+            "**Retrieved Transcript Excerpts:**  \n"
+            "    These passages were retrieved from the podcast transcripts as likely relevant "
+            "(they may come from other episodes):  \n"
+            f'    "{chatbot_response}"'
+        )
+        priority = "Prioritize sections that **match or continue** these excerpts."
+    else:
+        evidence = (
+            "**AI-Generated Chatbot Response:**  \n"
+            "    This response was generated by an AI chatbot and is **not a direct quote** from the podcast:  \n"
+            f'    "{chatbot_response}"'
+        )
+        priority = "Prioritize sections that the chatbot response was **likely based on**."
     timestamp_prompt = f"""
     You are analyzing a legal podcast transcript to find the most relevant timestamp for a user's question.
 
@@ -66,25 +751,24 @@ def find_best_video_segment(query, chatbot_response, full_transcript_text, struc
     **User's Question:**  
     "{query}"
 
-    **AI-Generated Chatbot Response:**  
-    This response was generated by an AI chatbot and is **not a direct quote** from the podcast:  
-    "{chatbot_response}"
+    {evidence}
 
     ---
     **Your Task:**  
     1. Identify the **section of the transcript** that **best answers the user's question**.  
-    2. Prioritize sections that the chatbot response was **likely based on**.  
+    2. {priority}  
     3. Extract the **start timestamp (in seconds)** of that section **from the structured transcript**.  
     4. Ensure the timestamp is **less than the total video duration** ({video_duration} seconds).  
     5. If no exact match is found, return the **closest matching timestamp** from the transcript.  
     6. **Respond with only the number** (e.g., "123"), with no extra text or symbols.
 
-    **Structured Podcast Transcript:**  
-    {structured_transcript}
+    **Structured Podcast Transcript:** (each line is "[start time in seconds] text")  
+    {transcript_text}
     """
+    print(f"🧮 Timestamp prompt: {count_tokens(timestamp_prompt)} tokens ({transcript_tokens} transcript)")
 
     try:
-        match_response = client.chat.completions.create(
+        match_response = await llm_client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are an AI assistant finding relevant transcript text and timestamps."},
@@ -105,8 +789,7 @@ def find_best_video_segment(query, chatbot_response, full_transcript_text, struc
             return None
 
         # 🔹 Step 3: Ensure Timestamp is Valid and Within Range
-        best_timestamp = max(0, min(best_timestamp - 2, video_duration))  # Adjust for context
-        return best_timestamp
+        return clamp_timestamp(best_timestamp, episode_id)  # Adjust for context
 
     except Exception as e:
         print(f"❌ ERROR finding best timestamp: {e}")
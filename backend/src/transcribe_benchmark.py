@@ -0,0 +1,68 @@
+"""
+Compare single-pass and chunked parallel transcription of one video.
+
+    python -m src.transcribe_benchmark data/videos/march_11.mp4 [--seconds 600] [--workers 4]
+
+Both paths use an already-loaded model, so the timings are transcription only
+(worker start-up and model loading are reported separately). --seconds limits
+the benchmark to the start of the (silence-trimmed, unless --no-trim) audio.
+"""
+import argparse
+import difflib
+import multiprocessing
+import os
+import time
+from src.audio import TRIM_SILENCE, prepare_audio
+from src.transcriber import (
+    CHUNK_SECONDS, SAMPLE_RATE, WHISPER_MODEL, WORD_TIMESTAMPS, available_cpus, get_model, plan_chunks, shift_segment,
+    transcribe_audio_chunked, transcription_pool
+)
+
+
+def wait_for_workers(barrier):
+    """Pool task that only returns once every worker is running one (so every initializer has finished)."""
+    barrier.wait(timeout=600)
+    return os.getpid()
+
+
+def transcript_words(segments):
+    return " ".join(segment["text"].strip() for segment in segments).lower().split()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--seconds", type=float, default=0, help="only use the first N seconds of audio")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS)
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    parser.add_argument("--no-trim", dest="trim_silence", action="store_false", default=TRIM_SILENCE)
+    args = parser.parse_args()
+
+    audio, _ = prepare_audio(args.video, args.trim_silence)
+    if args.seconds:
+        audio = audio[:int(args.seconds * SAMPLE_RATE)]
+    duration = len(audio) / SAMPLE_RATE
+    print(f"📊 {args.video}: {duration:.0f}s of audio, {len(plan_chunks(audio, args.chunk_seconds))} chunk(s)")
+
+    model = get_model(args.model)
+    started = time.perf_counter()
+    single = [shift_segment(segment, 0.0) for segment in model.transcribe(audio, verbose=None, word_timestamps=WORD_TIMESTAMPS)["segments"]]
+    single_seconds = time.perf_counter() - started
+    print(f"⏱️ Single pass: {single_seconds:.1f}s ({duration / single_seconds:.2f}x real time), {len(single)} segments")
+
+    workers = min(args.workers or available_cpus(), available_cpus())
+    started = time.perf_counter()
+    with transcription_pool(workers, args.model) as pool, multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(workers)
+        list(pool.map(wait_for_workers, [barrier] * workers))  # wait until every worker has loaded the model
+        startup_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chunked = list(transcribe_audio_chunked(audio, pool, args.chunk_seconds))
+        chunked_seconds = time.perf_counter() - started
+    print(f"⏱️ Worker start-up: {startup_seconds:.1f}s")
+    print(f"⏱️ Chunked parallel: {chunked_seconds:.1f}s ({duration / chunked_seconds:.2f}x real time), {len(chunked)} segments")
+
+    similarity = difflib.SequenceMatcher(None, transcript_words(single), transcript_words(chunked), autojunk=False).ratio()
+    print(f"🚀 Speedup: {single_seconds / chunked_seconds:.2f}x (word-level agreement with single pass: {similarity:.1%})")
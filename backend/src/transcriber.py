@@ -1,29 +1,457 @@
 import whisper
+import argparse
+import json
 import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+import numpy as np
+from src.audio import TRIM_SILENCE, prepare_audio
 
-def transcribe_video(video_path):
-    """Transcribes a video with Whisper and prints progress in real-time."""
-    model = whisper.load_model("small")  # Change to "medium" if needed
-    result = model.transcribe(video_path, verbose=True)  # Verbose shows progress
+# Constants
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")  # Change to "medium" if needed
+VIDEOS_DIR = "data/videos"
+TRANSCRIPTS_DIR = "data/structured_transcripts"  # read by src.corpus, one JSON file per episode
+WORD_TIMESTAMPS = os.getenv("TRANSCRIBE_WORD_TIMESTAMPS", "1") == "1"  # store per-word timings in the transcript
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".m4a", ".mp3", ".wav")
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE  # 16 kHz
 
-    transcript_path = video_path.replace(".mp4", ".txt").replace("videos", "transcripts")
-    os.makedirs(os.path.dirname(transcript_path), exist_ok=True)
+# Chunked transcription: long audio is cut at quiet points and the pieces run in parallel
+CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "300"))  # target chunk length (0 = whole file per worker)
+CHUNK_SEARCH_SECONDS = 30.0   # look this far either side of each target cut for the quietest moment
+CHUNK_OVERLAP_SECONDS = 1.0   # audio shared by neighbouring chunks so no word is cut in half
+FRAME_SECONDS = 0.1           # energy frame size for silence detection
+SEGMENT_FIELDS = ("start", "end", "text", "avg_logprob", "no_speech_prob", "words")
 
-    with open(transcript_path, "w") as f:
-        for segment in result["segments"]:
-            start_time = round(segment["start"], 2)
-            text = segment["text"]
-            print(f"[{start_time}s] {text}")  # Print transcription in real-time
-            f.write(f"[{start_time}s] {text}\n")  # Save to file as it transcribes
+# Loaded once per process (each pool worker keeps its own copy)
+_model = None
+_model_name = None
 
-    return result["segments"]
+def get_model(name=None):
+    """
+    Load the Whisper model on first use and reuse it for every later video.
 
-if __name__ == "__main__":
-    video_file = "data/videos/march_11.mp4"  # Change to actual filename
-    if os.path.exists(video_file):
-        print(f"🔄 Transcribing: {video_file} ...")
-        segments = transcribe_video(video_file)
-        print("✅ Transcription Complete! Check `data/transcripts/`")
+    Without a name, whichever model this process already loaded is used (a pool
+    worker's, see _init_worker), falling back to WHISPER_MODEL.
+    """
+    global _model, _model_name
+    name = name or _model_name or WHISPER_MODEL
+    if _model is None or _model_name != name:
+        print(f"🔄 Loading Whisper model '{name}' ...")
+        _model = whisper.load_model(name)
+        _model_name = name
+    return _model
+
+def available_cpus():
+    """CPU cores this process may run on (respects container/affinity limits where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def transcript_path_for(video_path, videos_dir=VIDEOS_DIR, transcripts_dir=TRANSCRIPTS_DIR):
+    """
+    data/videos/<sub>/<name>.mp4 -> data/structured_transcripts/<sub>_<name>.json
+
+    Flat, because the corpus registers every JSON file directly in transcripts_dir
+    under its file name (and keeps its chunks in the chunks/ subdirectory).
+    """
+    relative = os.path.relpath(video_path, videos_dir)
+    if relative.startswith(".."):
+        relative = os.path.basename(video_path)
+    name = "_".join(os.path.normpath(os.path.splitext(relative)[0]).split(os.sep))
+    return os.path.join(transcripts_dir, name + ".json")
+
+def structured_segment(segment):
+    """Segment in video time -> the transcript JSON entry the corpus reads ({"start_time", "end_time", "text", ...})."""
+    entry = {
+        "start_time": round(segment["start"], 2),
+        "end_time": round(segment["end"], 2),
+        "text": segment["text"],
+    }
+    if "avg_logprob" in segment:
+        entry["avg_logprob"] = round(segment["avg_logprob"], 4)
+    if segment.get("words"):
+        entry["words"] = [
+            {"word": word["word"], "start": round(word["start"], 2), "end": round(word["end"], 2),
+             "probability": round(word.get("probability", 1.0), 3)}
+            for word in segment["words"]
+        ]
+    return entry
+
+class StructuredTranscriptWriter:
+    """
+    Streams transcript entries into a JSON array as they are produced.
+
+    Entries go to <path>.partial and are flushed one by one; close() finishes the
+    array and renames it into place, so an interrupted run never looks finished.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.partial_path = path + ".partial"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(self.partial_path, "w")
+        self.file.write("[")
+        self.count = 0
+
+    def write(self, segment):
+        entry = json.dumps(structured_segment(segment), indent=4).replace("\n", "\n    ")
+        self.file.write(("," if self.count else "") + "\n    " + entry)
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]\n" if self.count else "]\n")
+        self.file.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def checkpoint_path_for(transcript_path):
+    return transcript_path + ".checkpoint"
+
+class TranscriptionCheckpoint:
+    """
+    Append-only record of finished chunks, so an interrupted transcription resumes where it stopped.
+
+    The file is JSON lines: a header with the chunk plan, then one {"chunk", "segments"}
+    line per finished chunk, flushed to disk as soon as the chunk is done. A checkpoint
+    made for a different plan (other audio or chunk length) is discarded.
+    """
+
+    def __init__(self, path, plan):
+        self.path = path
+        self.header = {"samples": plan[-1][1] if plan else 0, "chunks": [[int(value) for value in chunk] for chunk in plan]}
+        self.completed = self._load()
+        # Rewrite the file without any line cut short by the crash before appending to it
+        with open(path + ".tmp", "w") as f:
+            for line in [self.header, *({"chunk": index, "segments": segments} for index, segments in sorted(self.completed.items()))]:
+                f.write(json.dumps(line) + "\n")
+        os.replace(path + ".tmp", path)
+        self.file = open(path, "a")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        completed = {}
+        with open(self.path, "r") as f:
+            for number, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if number == 0:
+                    if record != self.header:
+                        print(f"⚠️ Discarding checkpoint for a different chunk plan: {self.path}")
+                        return {}
+                else:
+                    completed[record["chunk"]] = record["segments"]
+        return completed
+
+    def record(self, index, segments):
+        self.completed[index] = segments
+        self.file.write(json.dumps({"chunk": index, "segments": segments}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def find_cut_points(audio, chunk_seconds=CHUNK_SECONDS, search_seconds=CHUNK_SEARCH_SECONDS):
+    """
+    Sample positions to cut the audio at: near every chunk_seconds, at the quietest
+    half second within search_seconds of the target, so cuts land in pauses between words.
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    frames = len(audio) // frame
+    if chunk_seconds <= 0 or frames == 0:
+        return []
+
+    energy = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    smoothed = np.convolve(energy, np.ones(5) / 5, mode="same")  # a pause, not a single quiet frame
+
+    chunk_frames = int(chunk_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+    cuts = []
+    position = 0
+    while frames - position > chunk_frames * 1.5:  # don't leave a tiny last chunk
+        target = position + chunk_frames
+        low, high = max(position + 1, target - search_frames), min(frames - 1, target + search_frames)
+        position = low + int(np.argmin(smoothed[low:high + 1]))
+        cuts.append(position * frame + frame // 2)
+    return cuts
+
+def plan_chunks(audio, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    Split audio into [(audio start, audio end, owned start, owned end)] in samples.
+
+    Each chunk owns the span between two cuts and is padded by the overlap on both
+    sides; stitch_segments keeps only the segments centred in a chunk's owned span.
+    """
+    bounds = [0, *find_cut_points(audio, chunk_seconds), len(audio)]
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    return [
+        (max(0, start - overlap), min(len(audio), end + overlap), start, end)
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", "", text.lower()).split()
+
+def drop_repeated_words(previous_text, text, max_words=12, min_words=2):
+    """Drop text's leading words if they repeat the end of previous_text (the same speech heard by both chunks)."""
+    previous, current = normalize_words(previous_text), normalize_words(text)
+    for size in range(min(max_words, len(previous), len(current)), min_words - 1, -1):
+        if previous[-size:] == current[:size]:
+            words = text.split()
+            return " " + " ".join(words[size:]) if len(words) > size else ""
+    return text
+
+def stitch_segments(chunk_results):
+    """
+    Merge per-chunk segments (already shifted to video time) into one transcript.
+
+    chunk_results yields (owned start s, owned end s, segments) in order. A segment is
+    kept by the chunk whose owned span contains its midpoint, and words repeated
+    across a chunk boundary are dropped from the later chunk's first segment.
+    Segments are yielded as soon as their chunk comes in.
+    """
+    previous = None
+    for owned_start, owned_end, segments in chunk_results:
+        boundary = previous is not None
+        for segment in segments:
+            middle = (segment["start"] + segment["end"]) / 2
+            if not owned_start <= middle < owned_end:
+                continue
+            if boundary:
+                boundary = False
+                text = drop_repeated_words(previous["text"], segment["text"])
+                if not text.strip():
+                    continue
+                segment = dict(segment, text=text)
+            previous = segment
+            yield segment
+
+def shift_segment(segment, offset):
+    """Whisper segment -> plain dict in video time (word timings shifted too)."""
+    shifted = {key: segment[key] for key in SEGMENT_FIELDS if key in segment}
+    shifted["start"] = round(float(segment["start"]) + offset, 3)
+    shifted["end"] = round(float(segment["end"]) + offset, 3)
+    if "words" in shifted:
+        shifted["words"] = [
+            dict(word, start=round(float(word["start"]) + offset, 3), end=round(float(word["end"]) + offset, 3))
+            for word in shifted["words"]
+        ]
+    return shifted
+
+def transcribe_chunk(audio, offset, model=None, verbose=None, word_timestamps=WORD_TIMESTAMPS):
+    """Transcribe one piece of audio and return its segments in video time."""
+    model = model or get_model()
+    result = model.transcribe(audio, verbose=verbose, word_timestamps=word_timestamps)
+    return [shift_segment(segment, offset) for segment in result["segments"]]
+
+def transcribe_audio_chunked(audio, pool=None, chunk_seconds=CHUNK_SECONDS, checkpoint_path=None, model=None, verbose=None):
+    """
+    Transcribe audio as silence-aligned chunks and yield the stitched segments in order.
+
+    Chunks are spread over the worker pool, or run one after another in this process
+    without one. A chunk's segments are yielded once it and every chunk before it are
+    done. With checkpoint_path, every finished chunk is saved there as soon as it
+    completes and chunks already in the checkpoint aren't transcribed again.
+    """
+    chunks = plan_chunks(audio, chunk_seconds)
+    checkpoint = TranscriptionCheckpoint(checkpoint_path, chunks) if checkpoint_path else None
+    completed = checkpoint.completed if checkpoint else {}
+    if completed:
+        print(f"⏩ Resuming from checkpoint: {len(completed)}/{len(chunks)} chunk(s) already transcribed")
+
+    futures = {}
+    if pool is not None:
+        futures = {
+            pool.submit(transcribe_chunk, audio[start:end], start / SAMPLE_RATE): index
+            for index, (start, end, _, _) in enumerate(chunks) if index not in completed
+        }
+
+    def finish(index, segments):
+        if checkpoint:
+            checkpoint.record(index, segments)
+        completed[index] = segments
+
+    def chunk_results():
+        waiting = set(futures)
+        next_index = 0
+        while next_index < len(chunks):
+            start, end, owned_start, owned_end = chunks[next_index]
+            if next_index in completed:
+                yield owned_start / SAMPLE_RATE, owned_end / SAMPLE_RATE, completed[next_index]
+                next_index += 1
+            elif pool is None:
+                finish(next_index, transcribe_chunk(audio[start:end], start / SAMPLE_RATE, model, verbose))
+            else:
+                done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(futures[future], future.result())
+
+    try:
+        yield from stitch_segments(chunk_results())
+    finally:
+        for future in futures:
+            future.cancel()
+        if checkpoint:
+            checkpoint.close()
+
+def transcribe_video(video_path, model=None, transcript_path=None, verbose=True, pool=None, chunk_seconds=CHUNK_SECONDS,
+                     trim_silence=TRIM_SILENCE):
+    """
+    Transcribes a video with Whisper and prints progress in real-time.
+
+    Long audio is split at silences and the chunks are transcribed in parallel on the
+    worker pool (see transcription_pool), or in turn without one. Finished chunks are
+    checkpointed next to the transcript, so a rerun after a crash picks up where the
+    last one stopped. chunk_seconds=0 transcribes the whole file in one pass instead.
+
+    The audio is decoded once into a PCM cache next to the video (see src.audio);
+    with trim_silence, long silences are cut out first and the timestamps mapped back.
+    Segments are streamed into the structured JSON transcript as they are stitched.
+    """
+    transcript_path = transcript_path or transcript_path_for(video_path)
+    os.makedirs(os.path.dirname(transcript_path) or ".", exist_ok=True)
+    checkpoint_path = checkpoint_path_for(transcript_path)
+    audio, offsets = prepare_audio(video_path, trim_silence)
+    if chunk_seconds > 0:
+        segments = transcribe_audio_chunked(audio, pool, chunk_seconds, checkpoint_path, model, verbose)
     else:
-        print("❌ ERROR: Video file not found! Make sure it's in `data/videos/`")
+        model = model or get_model()
+        result = model.transcribe(audio, verbose=verbose, word_timestamps=WORD_TIMESTAMPS)  # Verbose shows progress
+        segments = [shift_segment(segment, 0.0) for segment in result["segments"]]
+
+    written = []
+    with StructuredTranscriptWriter(transcript_path) as writer:
+        for segment in segments:
+            segment = offsets.segment(segment)
+            writer.write(segment)
+            written.append(segment)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return written
 
+def find_pending_videos(videos_dir=VIDEOS_DIR, transcripts_dir=TRANSCRIPTS_DIR, force=False):
+    """Every video under videos_dir (recursively) that doesn't have a transcript yet, in a stable order."""
+    pending = []
+    for directory, _, names in os.walk(videos_dir):
+        for name in sorted(names):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            video_path = os.path.join(directory, name)
+            if force or not os.path.exists(transcript_path_for(video_path, videos_dir, transcripts_dir)):
+                pending.append(video_path)
+    return sorted(pending)
+
+def _init_worker(model_name, threads):
+    """Pool initializer: split the cores between workers and load the model once for this process."""
+    import torch
+
+    torch.set_num_threads(threads)
+    get_model(model_name)
+
+def transcription_pool(workers=None, model_name=WHISPER_MODEL):
+    """A process pool whose workers each hold a loaded model and an equal share of the CPU cores."""
+    cpus = available_cpus()
+    workers = max(1, min(workers or cpus, cpus))
+    threads = max(1, cpus // workers)
+    print(f"🧵 Starting {workers} transcription worker(s) x {threads} thread(s), model '{model_name}'")
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name, threads))
+
+def _transcribe_in_worker(video_path, transcript_path, chunk_seconds, trim_silence):
+    segments = transcribe_video(video_path, transcript_path=transcript_path, verbose=None, chunk_seconds=chunk_seconds,
+                                trim_silence=trim_silence)
+    return video_path, len(segments)
+
+def transcribe_directory(videos_dir=VIDEOS_DIR, transcripts_dir=TRANSCRIPTS_DIR, workers=None, model_name=WHISPER_MODEL,
+                         force=False, chunk_seconds=CHUNK_SECONDS, trim_silence=TRIM_SILENCE):
+    """
+    Transcribe every video in videos_dir that has no transcript yet, across a process pool.
+
+    With chunk_seconds > 0 the videos are taken one at a time and each is split into
+    chunks that keep every worker busy; otherwise each worker transcribes whole videos.
+    Returns the list of videos that failed.
+    """
+    pending = find_pending_videos(videos_dir, transcripts_dir, force)
+    if not pending:
+        print(f"✅ Nothing to transcribe in {videos_dir}")
+        return []
+
+    print(f"🔄 Transcribing {len(pending)} video(s) {'in chunks' if chunk_seconds > 0 else 'one per worker'}")
+    failed = []
+    with transcription_pool(workers if chunk_seconds > 0 else min(workers or len(pending), len(pending)), model_name) as pool:
+        if chunk_seconds > 0:
+            for done, video_path in enumerate(pending, start=1):
+                try:
+                    transcript_path = transcript_path_for(video_path, videos_dir, transcripts_dir)
+                    segments = transcribe_video(video_path, transcript_path=transcript_path, pool=pool,
+                                                chunk_seconds=chunk_seconds, trim_silence=trim_silence)
+                    print(f"✅ [{done}/{len(pending)}] {video_path}: {len(segments)} segments")
+                except Exception as e:
+                    failed.append(video_path)
+                    print(f"❌ [{done}/{len(pending)}] ERROR transcribing {video_path}: {e}")
+            return failed
+
+        futures = {
+            pool.submit(_transcribe_in_worker, video_path, transcript_path_for(video_path, videos_dir, transcripts_dir), chunk_seconds,
+                        trim_silence): video_path
+            for video_path in pending
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            video_path = futures[future]
+            try:
+                _, segment_count = future.result()
+                print(f"✅ [{done}/{len(pending)}] {video_path}: {segment_count} segments")
+            except Exception as e:
+                failed.append(video_path)
+                print(f"❌ [{done}/{len(pending)}] ERROR transcribing {video_path}: {e}")
+
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe every video in data/videos/ that doesn't have a transcript yet.")
+    parser.add_argument("videos", nargs="*", help="specific video files (default: everything pending in --videos-dir)")
+    parser.add_argument("--videos-dir", default=VIDEOS_DIR)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("TRANSCRIBE_WORKERS", "0")) or None,
+                        help="processes to run (default: one per available CPU core)")
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS,
+                        help="split long audio into chunks of about this length at silences (0 = whole videos per worker)")
+    parser.add_argument("--no-trim", dest="trim_silence", action="store_false", default=TRIM_SILENCE,
+                        help="transcribe long silences too instead of cutting them out first")
+    parser.add_argument("--force", action="store_true", help="re-transcribe videos that already have transcripts")
+    args = parser.parse_args()
+
+    if args.videos:
+        pool = transcription_pool(args.workers, args.model) if args.chunk_seconds > 0 else None
+        model = get_model(args.model) if pool is None else None
+        for video_file in args.videos:
+            if not os.path.exists(video_file):
+                print(f"❌ ERROR: Video file not found: {video_file}")
+                continue
+            print(f"🔄 Transcribing: {video_file} ...")
+            transcribe_video(video_file, model=model, pool=pool, chunk_seconds=args.chunk_seconds, trim_silence=args.trim_silence)
+        if pool is not None:
+            pool.shutdown()
+        print(f"✅ Transcription Complete! Check `{TRANSCRIPTS_DIR}/`")
+    elif not os.path.isdir(args.videos_dir):
+        print(f"❌ ERROR: Video directory not found! Put videos in `{args.videos_dir}/`")
+    else:
+        failed = transcribe_directory(args.videos_dir, workers=args.workers, model_name=args.model, force=args.force,
+                                      chunk_seconds=args.chunk_seconds, trim_silence=args.trim_silence)
+        if failed:
+            raise SystemExit(f"❌ {len(failed)} video(s) failed: {', '.join(failed)}")
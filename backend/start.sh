@@ -1,3 +1,4 @@
 #!/bin/bash
 cd "$(dirname "$0")"  # Ensure script runs from backend directory
+python -m src.columnar  # Refresh the memory-mapped corpus (only new or changed transcripts are parsed)
 uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
@@ -9,6 +9,7 @@ function App() {
   const [userQuestion, setUserQuestion] = useState("");
   const [response, setResponse] = useState(null);
   const [timestamp, setTimestamp] = useState(null);
+  const [videoUrl, setVideoUrl] = useState(null);
   const videoRef = useRef(null);
   const LOCAL_BACKEND_URL = "http://127.0.0.1:8000";
   const PROD_BACKEND_URL = "https://rnblawgroupchatbot.onrender.com";
@@ -24,6 +25,7 @@ function App() {
       const data = await res.json();
       setResponse(data.response || "No response available.");
       setTimestamp(data.timestamp || null);
+      setVideoUrl(data.video_url || null);
     } catch (err) {
       console.warn("⚠️ Local backend failed. Trying Render deployment...");
   
@@ -32,6 +34,7 @@ function App() {
         const data = await res.json();
         setResponse(data.response || "No response available.");
         setTimestamp(data.timestamp || null);
+        setVideoUrl(data.video_url || null);
       } catch (error) {
         console.error("❌ Both local and remote backends failed:", error);
         setResponse("Error retrieving response. Please try again later.");
@@ -43,7 +46,7 @@ function App() {
     if (timestamp !== null && videoRef.current) {
       videoRef.current.currentTime = timestamp;
     }
-  }, [timestamp]);
+  }, [timestamp, videoUrl]);
 
   return (
     <div className="App">
@@ -63,11 +66,11 @@ function App() {
           <h3>Response:</h3>
           <p>{response}</p>
 
-          {timestamp !== null && (
+          {timestamp !== null && videoUrl && (
             <div>
               <h4>Relevant Video Section:</h4>
-              <video controls width="600" ref={videoRef}>
-              <source src="https://www.dropbox.com/scl/fi/yz7xlp3qo3h95p4r0xtjv/march_11.mp4?rlkey=u9frr2ar77ohfhnenvkqleo0j&st=ldp6pqqo&dl=1" type="video/mp4" />
+              <video controls width="600" ref={videoRef} key={videoUrl}>
+              <source src={videoUrl} type="video/mp4" />
                 Your browser does not support the video tag.
               </video>
               <p>